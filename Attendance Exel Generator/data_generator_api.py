@@ -1,20 +1,166 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, HTMLResponse
 import sqlite3
-import pandas as pd
-import random
+import io
 import tempfile
 import os
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Border, Side, Font, PatternFill, Alignment
+from datetime import datetime, timedelta
+from functools import lru_cache
+import re
+import zipfile
+from xml.sax.saxutils import escape
 from typing import Optional
 
 app = FastAPI(title="Attendance Data Sheet Generator", version="1.0.0")
 
-def filter_last_two_punches(df):
+# Minimal XLSX package - the Data sheet is a plain grid, so the XML is written directly
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Data" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Styling - fonts, fills and borders referenced by the cellXfs indexes below
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="6">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="22"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="14"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="12"/><name val="Tahoma"/></font>'
+    '</fonts>'
+    '<fills count="5">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFFFF2CC"/><bgColor rgb="FFFFF2CC"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFFFFF00"/><bgColor rgb="FFFFFF00"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFB8CCE4"/><bgColor rgb="FFB8CCE4"/></patternFill></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="8">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="3" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="0" fontId="4" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="0" fontId="5" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="0" fontId="2" fillId="2" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" wrapText="1"/></xf>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="3" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="0" fillId="4" borderId="1" xfId="0" applyFill="1" applyBorder="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+TITLE_STYLE = 1
+SUBTITLE_STYLE = 2
+DATE_RANGE_STYLE = 3
+HEADER_STYLE = 4
+NORMAL_STYLE = 5
+SUNDAY_STYLE = 6  # Yellow
+SEPARATOR_STYLE = 7  # Light blue
+
+SHEET_HEAD_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    # Freeze panes at A7
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="6" topLeftCell="A7" activePane="bottomLeft" state="frozen"/>'
+    '<selection pane="bottomLeft"/>'
+    '</sheetView></sheetViews>'
+    # Data rows are all 18pt high, so that is the sheet default; only other heights are written per row
+    '<sheetFormatPr defaultRowHeight="18" customHeight="1"/>'
+    '<cols>'
+    '<col min="1" max="1" width="12" customWidth="1"/>'  # Employee ID
+    '<col min="2" max="2" width="25" customWidth="1"/>'  # Name
+    '<col min="3" max="8" width="10" customWidth="1"/>'  # In / Out
+    '</cols>'
+    '<sheetData>'
+)
+SHEET_TAIL_XML = '</sheetData></worksheet>'
+
+COLUMN_LETTERS = 'ABCDEFGH'
+
+# Punch rows fetched from SQLite per round trip
+FETCH_BATCH_SIZE = 10000
+
+# Fast deflate - the sheet XML is highly repetitive, so level 1 is barely larger than the default 6
+ZIP_COMPRESS_LEVEL = 1
+
+# Control characters XML 1.0 does not allow, and literal _xHHHH_ text that Excel would read as an escape
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+EXCEL_ESCAPE_TEXT = re.compile(r'_x[0-9a-fA-F]{4}_')
+
+# Prebuilt cell XML around the row number and value, keyed by style: (letter, empty tail, value tail)
+CELL_TEMPLATES = {
+    style: [(f'<c r="{col}', f'" s="{style}"/>', f'" s="{style}" t="inlineStr"><is>')
+            for col in COLUMN_LETTERS]
+    for style in (TITLE_STYLE, SUBTITLE_STYLE, DATE_RANGE_STYLE, HEADER_STYLE,
+                  NORMAL_STYLE, SUNDAY_STYLE, SEPARATOR_STYLE)
+}
+
+# Fixed sheet layout
+REPORT_SUBTITLE = "Raw Punch Data Report"
+HEADER_VALUES = ('Employee ID', 'Name', 'In', 'Out', 'In', 'Out', 'In', 'Out')
+SEPARATOR_VALUES = (None,) * len(HEADER_VALUES)
+
+def time_to_seconds(time_str):
+    """Convert HH:MM:SS time to seconds"""
+    try:
+        hours, minutes, seconds = time_str.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+def split_punches(punches):
     """
-    Check ALL consecutive punch pairs in each row.
+    Split the comma-joined punch times of one day into a time-ordered list.
+    
+    Applies the first 10-minute check (to the second): if Punch 2 is less than
+    10 minutes after Punch 1 it is skipped and the later punches shift left.
+    Only the first 7 punches of a day are considered; at most 6 are returned.
+    """
+    times = sorted(punches.split(','))[:7] if punches else []
+    if len(times) >= 2:
+        first, second = time_to_seconds(times[0]), time_to_seconds(times[1])
+        if first is not None and second is not None and second - first < 600:
+            del times[1]
+    return times[:6]
+
+def filter_last_two_punches(punches):
+    """
+    Check ALL consecutive punch pairs in one day's punch list.
     Different logic for first half vs second half:
     
     FIRST HALF (positions 0-3): Keep FIRST punch (earlier time)
@@ -26,80 +172,61 @@ def filter_last_two_punches(df):
     - Punch 4 → Punch 5: If < 10 min, keep Punch 5, remove Punch 4
     - Punch 5 → Punch 6: If < 10 min, keep Punch 6, remove Punch 5
     
+    Times are compared to the minute.
+    
     Example:
     Input:  08:30, 08:32, 12:00, 20:06, 20:07
             ^^^^^^^^^^^^^ Keep 08:30 (first)
                                 ^^^^^^^^^^^^^ Keep 20:07 (second)
     Output: 08:30, 12:00, 20:07
     """
-    def time_to_seconds(time_str):
-        """Convert HH:MM time to seconds"""
-        if not time_str or pd.isna(time_str) or time_str == '':
-            return None
-        try:
-            parts = str(time_str).split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            return hours * 3600 + minutes * 60
-        except:
-            return None
+    punches = list(punches)
     
-    punch_cols = ['punch_1', 'punch_2', 'punch_3', 'punch_4', 'punch_5', 'punch_6']
-    
-    # Process each row
-    for idx in df.index:
-        # Keep checking until no more duplicates found
-        changed = True
-        while changed:
-            changed = False
-            
-            # Collect all non-empty punches
-            punches = []
-            for col in punch_cols:
-                punch_value = df.loc[idx, col]
-                if punch_value and not pd.isna(punch_value) and str(punch_value).strip() != '':
-                    punches.append(punch_value)
-            
-            # Check each consecutive pair
-            for i in range(len(punches) - 1):
-                current_time = punches[i]
-                next_time = punches[i + 1]
-                
-                # Convert to seconds
-                current_seconds = time_to_seconds(current_time)
-                next_seconds = time_to_seconds(next_time)
-                
-                # Check if both are valid and less than 10 minutes (600 seconds) apart
-                if current_seconds is not None and next_seconds is not None:
-                    time_diff = abs(next_seconds - current_seconds)
-                    
-                    # If less than 10 minutes apart, it's a duplicate
-                    if time_diff < 600:
-                        # Decide which punch to remove based on position
-                        # First half (positions 0-3): Keep first punch (remove second)
-                        # Second half (positions 4-5): Keep second punch (remove first)
-                        
-                        if i < 3:  # First half: positions 0→1, 1→2, 2→3
-                            # Keep current (first), remove next (second)
-                            punches.pop(i + 1)
-                        else:  # Second half: positions 3→4, 4→5
-                            # Keep next (second), remove current (first)
-                            punches.pop(i)
-                        
-                        changed = True
-                        break  # Start checking again from the beginning
-            
-            # Rebuild the punch sequence without duplicates
-            # Clear all punch columns first
-            for col in punch_cols:
-                df.loc[idx, col] = None
+    # Keep checking until no more duplicates found
+    changed = True
+    while changed:
+        changed = False
+        # Seconds are ignored: compare HH:MM only
+        seconds = [time_to_seconds(p) for p in punches]
+        seconds = [s - s % 60 if s is not None else None for s in seconds]
+        
+        # Check each consecutive pair
+        for i in range(len(punches) - 1):
+            current_seconds, next_seconds = seconds[i], seconds[i + 1]
             
-            # Reassign cleaned punches
-            for i, punch in enumerate(punches):
-                if i < len(punch_cols):
-                    df.loc[idx, punch_cols[i]] = punch
+            # If less than 10 minutes (600 seconds) apart, it's a duplicate
+            if current_seconds is not None and next_seconds is not None \
+                    and abs(next_seconds - current_seconds) < 600:
+                if i < 3:  # First half: keep current (first), remove next (second)
+                    punches.pop(i + 1)
+                else:  # Second half: keep next (second), remove current (first)
+                    punches.pop(i)
+                changed = True
+                break  # Start checking again from the beginning
     
-    return df
+    return punches
+
+@lru_cache(maxsize=None)
+def is_sunday(date_str):
+    """True if a YYYY-MM-DD date falls on a Sunday (parsed once per distinct date)"""
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').weekday() == 6  # 6 = Sunday
+    except (TypeError, ValueError):
+        return False
+
+def iter_punch_rows(cursor, batch):
+    """
+    Yield (employee_id, full_name, is_sunday, punch_1..punch_6) rows, fetching
+    FETCH_BATCH_SIZE rows at a time. The 10-minute rule only looks at one day's
+    punches, so it is applied row by row as the batches arrive.
+    """
+    while batch:
+        for employee_id, full_name, date_str, punches in batch:
+            # Apply 10-minute rule (filters duplicate punches) and format times as HH:MM
+            times = [t[:5] for t in filter_last_two_punches(split_punches(punches))]
+            times += [None] * (6 - len(times))
+            yield (employee_id, full_name, is_sunday(date_str), *times)
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
 
 @app.post("/generate-data-sheet")
 async def generate_data_sheet(
@@ -129,132 +256,72 @@ async def generate_data_sheet(
     
     # Create temporary file for uploaded database
     with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_db:
-        content = await db_file.read()
-        temp_db.write(content)
+        # Copy in 1 MiB chunks so the whole upload is never held in memory
+        while True:
+            chunk = await db_file.read(1 << 20)
+            if not chunk:
+                break
+            temp_db.write(chunk)
         temp_db_path = temp_db.name
     
     try:
-        # Connect to the temporary database
+        # Connect to the temporary database (a throwaway copy, so durability doesn't matter)
         conn = sqlite3.connect(temp_db_path)
         
-        # Get raw punch data with 10-minute rule (filters duplicate punches)
-        raw_punch_query = f"""
+        # Bulk-read settings: no journal/fsync, memory-mapped file, larger page cache
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        
+        # Index for the punch_time range seek; also covers the columns the query reads from att_punches
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_punches_time ON att_punches(punch_time, employee_id)")
+        
+        # Date range as a half-open punch_time range so the index can be used
+        range_end = (datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        
+        # Get raw punch times, one comma-joined list per employee per day
+        raw_punch_query = """
         WITH punches_per_day AS (
             SELECT 
                 p.employee_id,
                 date(p.punch_time) AS punch_date,
-                time(p.punch_time) AS punch_time,
-                p.punch_time AS full_punch_time
+                GROUP_CONCAT(time(p.punch_time)) AS punches
             FROM att_punches p
-            WHERE date(p.punch_time) >= '{start_date}'
-            AND date(p.punch_time) <= '{end_date}'
-        ),
-        
-        ranked_punches AS (
-            SELECT
-                p.employee_id,
-                p.punch_date,
-                p.punch_time,
-                p.full_punch_time,
-                ROW_NUMBER() OVER (PARTITION BY p.employee_id, p.punch_date ORDER BY p.full_punch_time ASC) AS rn
-            FROM punches_per_day p
-        ),
-        
-        initial_punches AS (
-            SELECT 
-                employee_id,
-                punch_date,
-                MAX(CASE WHEN rn = 1 THEN punch_time END) AS punch_1,
-                MAX(CASE WHEN rn = 2 THEN punch_time END) AS punch_2,
-                MAX(CASE WHEN rn = 3 THEN punch_time END) AS punch_3,
-                MAX(CASE WHEN rn = 4 THEN punch_time END) AS punch_4,
-                MAX(CASE WHEN rn = 5 THEN punch_time END) AS punch_5,
-                MAX(CASE WHEN rn = 6 THEN punch_time END) AS punch_6,
-                MAX(CASE WHEN rn = 7 THEN punch_time END) AS punch_7,
-                MAX(CASE WHEN rn = 1 THEN full_punch_time END) AS full_punch_1,
-                MAX(CASE WHEN rn = 2 THEN full_punch_time END) AS full_punch_2
-            FROM ranked_punches
-            GROUP BY employee_id, punch_date
-        ),
-        
-        filtered_punches AS (
-            SELECT 
-                employee_id,
-                punch_date,
-                punch_1,
-                -- Apply 10-minute rule: if punch_2 is less than 10 minutes after punch_1, skip it
-                CASE 
-                    WHEN full_punch_1 IS NOT NULL AND full_punch_2 IS NOT NULL 
-                         AND (strftime('%s', full_punch_2) - strftime('%s', full_punch_1)) < 600
-                    THEN punch_3  -- Skip punch_2, use punch_3 instead
-                    ELSE punch_2  -- Use punch_2 normally
-                END AS punch_2,
-                CASE 
-                    WHEN full_punch_1 IS NOT NULL AND full_punch_2 IS NOT NULL 
-                         AND (strftime('%s', full_punch_2) - strftime('%s', full_punch_1)) < 600
-                    THEN punch_4  -- Shift punch_4 to position 3
-                    ELSE punch_3  -- Use punch_3 normally
-                END AS punch_3,
-                CASE 
-                    WHEN full_punch_1 IS NOT NULL AND full_punch_2 IS NOT NULL 
-                         AND (strftime('%s', full_punch_2) - strftime('%s', full_punch_1)) < 600
-                    THEN punch_5  -- Shift punch_5 to position 4
-                    ELSE punch_4  -- Use punch_4 normally
-                END AS punch_4,
-                CASE 
-                    WHEN full_punch_1 IS NOT NULL AND full_punch_2 IS NOT NULL 
-                         AND (strftime('%s', full_punch_2) - strftime('%s', full_punch_1)) < 600
-                    THEN punch_6  -- Shift punch_6 to position 5
-                    ELSE punch_5  -- Use punch_5 normally
-                END AS punch_5,
-                CASE 
-                    WHEN full_punch_1 IS NOT NULL AND full_punch_2 IS NOT NULL 
-                         AND (strftime('%s', full_punch_2) - strftime('%s', full_punch_1)) < 600
-                    THEN punch_7  -- Shift punch_7 to position 6
-                    ELSE punch_6  -- Use punch_6 normally
-                END AS punch_6
-            FROM initial_punches
+            WHERE p.punch_time >= ?
+            AND p.punch_time < ?
+            GROUP BY p.employee_id, punch_date
         )
         
         SELECT 
             e.emp_pin AS employee_id,
             e.emp_firstname || ' ' || COALESCE(e.emp_lastname, '') AS full_name,
-            fp.punch_date AS Date,
-            fp.punch_1,
-            fp.punch_2,
-            fp.punch_3,
-            fp.punch_4,
-            fp.punch_5,
-            fp.punch_6
-        FROM filtered_punches fp
-        JOIN hr_employee e ON e.emp_pin = (
-            SELECT emp_pin FROM hr_employee WHERE id = fp.employee_id LIMIT 1
-        )
+            pd.punch_date AS Date,
+            pd.punches
+        FROM punches_per_day pd
+        JOIN hr_employee e ON e.id = pd.employee_id
         ORDER BY employee_id, Date;
         """
         
-        raw_punch_df = pd.read_sql_query(raw_punch_query, conn)
+        cursor = conn.execute(raw_punch_query, (start_date, range_end))
+        first_batch = cursor.fetchmany(FETCH_BATCH_SIZE)
         
-        if raw_punch_df.empty:
+        if not first_batch:
             raise HTTPException(status_code=404, detail="No punch data found for the specified date range")
         
         # Get company name
-        title_query = "SELECT cmp_name FROM hr_company LIMIT 1;"
-        title_df = pd.read_sql_query(title_query, conn)
-        company_name = title_df.iloc[0]['cmp_name'] if not title_df.empty else "Company Name"
+        title_row = conn.execute("SELECT cmp_name FROM hr_company LIMIT 1;").fetchone()
+        company_name = title_row[0] if title_row else "Company Name"
         
+        # Generate Excel file - rows are fetched in batches while the sheet is written
+        output = create_data_excel(iter_punch_rows(cursor, first_batch), company_name, start_date, end_date)
         conn.close()
         
-        # Apply 10-minute rule to LAST two punches (check for duplicate at end)
-        raw_punch_df = filter_last_two_punches(raw_punch_df)
-        
-        # Generate Excel file
-        output_file = create_data_excel(raw_punch_df, company_name, start_date, end_date)
-        
-        return FileResponse(
-            path=output_file,
-            filename=f"attendance_data_{start_date}_to_{end_date}.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        return StreamingResponse(
+            output,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f'attachment; filename="attendance_data_{start_date}_to_{end_date}.xlsx"'}
         )
         
     except sqlite3.Error as e:
@@ -266,150 +333,88 @@ async def generate_data_sheet(
         if os.path.exists(temp_db_path):
             os.unlink(temp_db_path)
 
-def create_data_excel(raw_punch_df, company_name, start_date, end_date):
+def xml_text(value):
+    """Build the <t> element for a cell string; control characters become _xHHHH_ escapes the way xlsxwriter writes them"""
+    if '_x' in value:
+        value = EXCEL_ESCAPE_TEXT.sub(lambda m: '_x005F' + m.group(0), value)
+    if ILLEGAL_XML_CHARS.search(value):
+        value = ILLEGAL_XML_CHARS.sub(lambda m: f'_x{ord(m.group(0)):04X}_', value)
+    # Keep leading/trailing spaces, e.g. "First " from a NULL last name
+    space = ' xml:space="preserve"' if value != value.strip() else ''
+    return f'<t{space}>{escape(value)}</t>'
+
+def xml_row(row_num, values, style, height=None):
+    """Build one <row> of inline-string cells sharing a style"""
+    r = str(row_num)
+    ht = f' ht="{height}" customHeight="1"' if height is not None else ''
+    cells = [f'<row r="{r}"{ht}>']
+    for (col, empty_tail, value_tail), value in zip(CELL_TEMPLATES[style], values):
+        if value is None or value == '':
+            cells.append(col + r + empty_tail)
+        else:
+            cells.append(col + r + value_tail + xml_text(str(value)) + '</is></c>')
+    cells.append('</row>')
+    return ''.join(cells)
+
+def create_data_excel(punch_rows, company_name, start_date, end_date):
     """Generate Excel file with Data sheet only"""
     
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Data"
-    
-    # Styling
-    thin_border = Border(left=Side(style='thin'),
-                         right=Side(style='thin'),
-                         top=Side(style='thin'),
-                         bottom=Side(style='thin'))
-    
-    tahoma_font = Font(name='Tahoma', size=10)
-    tahoma_bold_font = Font(name='Tahoma', size=10, bold=True)
-    title_font = Font(name='Tahoma', size=22, bold=True)
-    subtitle_font = Font(name='Tahoma', size=14, bold=True)
-    date_range_font = Font(name='Tahoma', size=12, bold=True)
-    header_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-    yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-    
-    # Blue fill for employee separator rows
-    blue_fill = PatternFill(start_color='B8CCE4', end_color='B8CCE4', fill_type='solid')  # Light blue
-    
-    current_row = 1
-    
-    # Add company name title
-    ws.cell(row=current_row, column=1, value=company_name).font = title_font
-    current_row += 2
-    
-    # Add subtitle
-    ws.cell(row=current_row, column=1, value="Raw Punch Data Report").font = subtitle_font
-    current_row += 1
-    
-    # Add date range
-    date_range_text = f"{start_date} to {end_date}"
-    ws.cell(row=current_row, column=1, value=date_range_text).font = date_range_font
-    current_row += 2
-    
-    # Column headers
-    headers = ['Employee ID', 'Name', 'In', 'Out', 'In', 'Out', 'In', 'Out']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws.cell(row=current_row, column=col_idx, value=header)
-        cell.font = tahoma_bold_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(wrap_text=True, horizontal='center')
-        cell.border = thin_border
-    ws.row_dimensions[current_row].height = 30
-    current_row += 1
-    
-    # Function to format time from HH:MM:SS to HH:MM
-    def format_time(time_str):
-        if not time_str or time_str == '' or pd.isna(time_str):
-            return ''
-        try:
-            if time_str.count(':') == 2:
-                parts = time_str.split(':')
-                return f"{parts[0]}:{parts[1]}"
-            else:
-                return time_str
-        except:
-            return ''
-    
-    # Write data rows
-    if not raw_punch_df.empty:
-        current_employee = None
-        for _, row in raw_punch_df.iterrows():
-            # Check if this is a new employee
-            if current_employee is not None and current_employee != row.get('employee_id', ''):
-                # Add blue separator row between employees
-                for col_idx in range(1, len(headers) + 1):
-                    cell = ws.cell(row=current_row, column=col_idx, value='')
-                    cell.fill = blue_fill
-                    cell.border = thin_border
-                ws.row_dimensions[current_row].height = 5  # Thin separator
-                current_row += 1
-            
-            # Update current employee
-            current_employee = row.get('employee_id', '')
-            # Check if Sunday for yellow highlighting
-            date_str = str(row.get('Date', ''))
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                is_sunday = date_obj.weekday() == 6  # 6 = Sunday
-            except:
-                is_sunday = False
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        zf.writestr('_rels/.rels', ROOT_RELS_XML)
+        zf.writestr('xl/workbook.xml', WORKBOOK_XML)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+        zf.writestr('xl/styles.xml', STYLES_XML)
+        
+        # Stream the sheet XML into the archive as rows arrive
+        with io.TextIOWrapper(zf.open('xl/worksheets/sheet1.xml', 'w'), encoding='utf-8') as sheet:
+            sheet.write(SHEET_HEAD_XML)
             
-            # Employee ID
-            cell = ws.cell(row=current_row, column=1, value=row.get('employee_id', ''))
-            cell.font = tahoma_font
-            cell.border = thin_border
-            if is_sunday:
-                cell.fill = yellow_fill
+            # Add company name title
+            sheet.write(xml_row(1, (company_name,), TITLE_STYLE, height=28.5))  # Fits the 22pt title
             
-            # Employee Name
-            cell = ws.cell(row=current_row, column=2, value=row.get('full_name', ''))
-            cell.font = tahoma_font
-            cell.border = thin_border
-            if is_sunday:
-                cell.fill = yellow_fill
+            # Add subtitle
+            sheet.write(xml_row(3, (REPORT_SUBTITLE,), SUBTITLE_STYLE))
             
-            # Punch times (In, Out, In, Out, In, Out) - using punch_1 through punch_6
-            punch_columns = ['punch_1', 'punch_2', 'punch_3', 'punch_4', 'punch_5', 'punch_6']
-            for col_idx, punch_col in enumerate(punch_columns, start=3):
-                punch_value = format_time(row.get(punch_col, ''))
-                cell = ws.cell(row=current_row, column=col_idx, value=punch_value)
-                cell.font = tahoma_font
-                cell.border = thin_border
-                if is_sunday:
-                    cell.fill = yellow_fill
+            # Add date range
+            date_range_text = f"{start_date} to {end_date}"
+            sheet.write(xml_row(4, (date_range_text,), DATE_RANGE_STYLE))
+            current_row = 6
             
-            ws.row_dimensions[current_row].height = 18
+            # Column headers
+            sheet.write(xml_row(current_row, HEADER_VALUES, HEADER_STYLE, height=30))
             current_row += 1
+            
+            # Write data rows
+            current_employee = None
+            for emp_id, name, sunday, p1, p2, p3, p4, p5, p6 in punch_rows:
+                # Check if this is a new employee
+                if current_employee is not None and current_employee != emp_id:
+                    # Add blue separator row between employees (thin)
+                    sheet.write(xml_row(current_row, SEPARATOR_VALUES, SEPARATOR_STYLE, height=5))
+                    current_row += 1
+                
+                # Update current employee
+                current_employee = emp_id
+                
+                # Employee ID, Name and punch times (In, Out, In, Out, In, Out) - already formatted as HH:MM
+                # Sunday rows get yellow highlighting
+                style = SUNDAY_STYLE if sunday else NORMAL_STYLE
+                sheet.write(xml_row(current_row, (emp_id, name, p1, p2, p3, p4, p5, p6), style))
+                current_row += 1
+            
+            sheet.write(SHEET_TAIL_XML)
+    output.seek(0)
     
-    # Freeze panes at header row
-    ws.freeze_panes = 'A7'
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 12  # Employee ID
-    ws.column_dimensions['B'].width = 25  # Name
-    ws.column_dimensions['C'].width = 10  # In
-    ws.column_dimensions['D'].width = 10  # Out
-    ws.column_dimensions['E'].width = 10  # In
-    ws.column_dimensions['F'].width = 10  # Out
-    ws.column_dimensions['G'].width = 10  # In
-    ws.column_dimensions['H'].width = 10  # Out
-    
-    # Save Excel file
-    random_num = random.randint(1000, 9999)
-    filename = f"attendance_data_{random_num}.xlsx"
-    wb.save(filename)
-    
-    return filename
+    return output
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """Serve the HTML upload form"""
-    try:
-        with open("upload_form.html", "r", encoding="utf-8") as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content)
-    except FileNotFoundError:
-        return HTMLResponse(content="""
+# Upload form read and encoded once at import; restart the server to pick up edits to the file
+try:
+    with open("upload_form.html", "rb") as f:
+        FORM_HTML = f.read()
+except FileNotFoundError:
+    FORM_HTML = """
         <html>
             <head>
                 <title>Attendance Data Sheet Generator</title>
@@ -432,7 +437,12 @@ async def root():
                 <p><a href="/docs">→ Open Interactive API Documentation</a></p>
             </body>
         </html>
-        """)
+        """.encode("utf-8")
+
+@app.get("/", response_class=HTMLResponse)
+async def root():
+    """Serve the HTML upload form"""
+    return HTMLResponse(content=FORM_HTML)
 
 @app.get("/api")
 async def api_info():
@@ -1,17 +1,229 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 import sqlite3
+import json
 import pandas as pd
-import random
+import numpy as np
 import tempfile
+import shutil
+import anyio.to_thread
 import os
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Border, Side, Font, PatternFill, Alignment
+import io
+import zipfile
 from typing import Optional
+from xlsx_xml import (CONTENT_TYPES_XML, ROOT_RELS_XML, WORKBOOK_XML, WORKBOOK_RELS_XML, SHEET_HEAD_XML, SHEET_TAIL_XML,
+                      solid_fill_xml, xf_xml, column_letters, xml_row)
 
 app = FastAPI(title="Attendance Report Generator", version="1.0.0")
 
+# Fonts and fills (same as saya.py); cellXfs indexes are the *_STYLE constants below
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="5">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="22"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="14"/><name val="Tahoma"/></font>'
+    '</fonts>'
+    '<fills count="9">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    + solid_fill_xml('FFF2CC')   # 2 header
+    + solid_fill_xml('FFCC99')   # 3 total base
+    + solid_fill_xml('E2EFDA')   # 4 total day
+    + solid_fill_xml('FFE4B5')   # 5 clock header
+    + solid_fill_xml('ADD8E6')   # 6 OT header
+    + solid_fill_xml('E6E6FA')   # 7 penalty
+    + solid_fill_xml('FFFF00')   # 8 yellow (Sunday)
+    + '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="16">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    + xf_xml(3, border=0)                 # 1 title
+    + xf_xml(4, border=0)                 # 2 subtitle
+    + xf_xml(2, 2, wrap=True)             # 3 header
+    + xf_xml(2, 3, wrap=True)             # 4 header - Total Base
+    + xf_xml(2, 4, wrap=True)             # 5 header - Total Day / Night Shift / Allowence
+    + xf_xml(2, 5, wrap=True)             # 6 header - Clock-In / Clock-Out / In / Out
+    + xf_xml(2, 6, wrap=True)             # 7 header - OT
+    + xf_xml(2, 7, wrap=True)             # 8 header - Penalty
+    + xf_xml(2)                           # 9 bold label
+    + xf_xml(1)                           # 10 default
+    + xf_xml(1, 8)                        # 11 Sunday
+    + xf_xml(1, 7)                        # 12 penalty
+    + xf_xml(1, 3)                        # 13 total base
+    + xf_xml(1, 4)                        # 14 total day
+    + xf_xml(0)                           # 15 blank bordered cell
+    + '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+TITLE_STYLE = 1
+SUBTITLE_STYLE = 2
+HEADER_STYLE = 3
+HEADER_TOTAL_BASE_STYLE = 4
+HEADER_TOTAL_DAY_STYLE = 5
+HEADER_CLOCK_STYLE = 6
+HEADER_OT_STYLE = 7
+HEADER_PENALTY_STYLE = 8
+LABEL_STYLE = 9
+DEFAULT_STYLE = 10
+SUNDAY_STYLE = 11
+PENALTY_STYLE = 12
+TOTAL_BASE_STYLE = 13
+TOTAL_DAY_STYLE = 14
+BLANK_STYLE = 15
+
+# Column letters A..AE for the 31 report columns
+COLUMN_LETTERS = column_letters(31)
+
+# Rows per read_sql_query chunk and the repeated text columns kept as categoricals
+READ_CHUNK_SIZE = 50000
+CATEGORY_DTYPES = {'department': 'category', 'Workday': 'category', 'Timetable': 'category'}
+
+# Attendance rows for a punch_time range: ? = first day of the start month, ? = first day after the end month
+ATTENDANCE_QUERY = """
+WITH punches_per_day AS (
+    -- One row per employee per day with all punch times as a JSON array (ordered in Python)
+    SELECT 
+        p.employee_id,
+        date(p.punch_time) AS punch_date,
+        json_group_array(time(p.punch_time)) AS punches
+    FROM att_punches p
+    WHERE p.punch_time >= ?
+    AND p.punch_time < ?
+    GROUP BY p.employee_id, punch_date
+),
+
+final AS (
+    SELECT
+        e.emp_pin AS employee_id,
+        e.emp_firstname || ' ' || COALESCE(e.emp_lastname, '') AS full_name,
+        d.dept_name AS department,
+        r.punch_date AS Date,
+        CASE strftime('%w', r.punch_date)
+            WHEN '0' THEN 'Sun.'
+            WHEN '1' THEN 'Mon.'
+            WHEN '2' THEN 'Tues.'
+            WHEN '3' THEN 'Wed.'
+            WHEN '4' THEN 'Thur.'
+            WHEN '5' THEN 'Fri.'
+            WHEN '6' THEN 'Sat.'
+        END AS Workday,
+        tt.timetable_name AS Timetable,
+        time(tt.timetable_start) AS StartWorkTime,
+        time(tt.timetable_end) AS EndWorkTime,
+        MAX(r.punches) AS punches
+    FROM punches_per_day r
+    JOIN hr_employee e ON e.id = r.employee_id
+    LEFT JOIN hr_department d ON e.department_id = d.id
+    LEFT JOIN att_day_details ad ON ad.employee_id = r.employee_id AND date(ad.att_date) = r.punch_date
+    LEFT JOIN att_timetable tt ON ad.timetable_id = tt.id
+    GROUP BY e.emp_pin, e.emp_firstname, e.emp_lastname, d.dept_name, r.punch_date, tt.timetable_name, tt.timetable_start, tt.timetable_end
+)
+SELECT
+    employee_id,
+    full_name,
+    department,
+    Date,
+    Workday,
+    Timetable,
+    StartWorkTime,
+    EndWorkTime,
+    punches
+FROM final
+ORDER BY employee_id, Date;
+"""
+
+COMPANY_QUERY = "SELECT cmp_name FROM hr_company LIMIT 1;"
+
+def time_to_seconds(series):
+    """Vectorized HH:MM[:SS] -> seconds of day; NaN where missing or not a valid time (e.g. negative parts)"""
+    parts = series.astype('string').str.extract(r'^(\d{2}):(\d{2})(?::(\d{2}))?$').astype(float)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2].fillna(0)).to_numpy()
+
+def format_duration(seconds):
+    """Vectorized seconds -> HH:MM, truncating toward zero like SQLite's printf('%02d:%02d'); NaN -> 00:00"""
+    seconds = np.nan_to_num(np.asarray(seconds, dtype=float), nan=0.0)
+    hours = pd.Series(np.trunc(seconds / 3600).astype(np.int64)).astype(str).str.zfill(2)
+    minutes = pd.Series(np.trunc(np.fmod(seconds, 3600) / 60).astype(np.int64)).astype(str).str.zfill(2)
+    return (hours + ':' + minutes).to_numpy()
+
+def split_punches(df):
+    """Replace the JSON punch list of each day with its first four punches in time order"""
+    punch_lists = [sorted(t for t in json.loads(punches) if t is not None) for punches in df['punches']]
+    punch_df = pd.DataFrame([(p + [None] * 4)[:4] for p in punch_lists],
+                            columns=['Clock-In', 'Clock-Out', 'In', 'Out'], index=df.index)
+    return pd.concat([df.drop(columns=['punches']), punch_df], axis=1)
+
+def calculate_attendance_columns(df):
+    """Add the calculated attendance columns to the raw punch/timetable rows in one vectorized pass"""
+    clock_in = time_to_seconds(df['Clock-In'])
+    clock_out = time_to_seconds(df['Clock-Out'])
+    in_time = time_to_seconds(df['In'])
+    out_time = time_to_seconds(df['Out'])
+    start = time_to_seconds(df['StartWorkTime'])
+    end = time_to_seconds(df['EndWorkTime'])
+    has_clock_in = df['Clock-In'].notna().to_numpy()
+    has_clock_out = df['Clock-Out'].notna().to_numpy()
+    has_in = df['In'].notna().to_numpy()
+    has_out = df['Out'].notna().to_numpy()
+
+    # Late Clock In
+    df['Late Clock In'] = format_duration(np.where(clock_in > start, clock_in - start, 0))
+
+    # Early Clock In
+    df['Early Clock In'] = format_duration(np.where(clock_in < start, start - clock_in, 0))
+
+    # Early Clock Out: Use `Out` first, fallback to `Clock-Out`
+    df['Early Clock Out'] = format_duration(np.select(
+        [has_out & (out_time < end), ~has_out & has_clock_out & (clock_out < end)],
+        [end - out_time, end - clock_out],
+        0
+    ))
+
+    # Break (wraps past midnight)
+    break_diff = in_time - clock_out
+    df['Break'] = format_duration(np.select(
+        [has_in & has_clock_out & (break_diff >= 0), has_in & has_clock_out],
+        [break_diff, break_diff + 86400],
+        0
+    ))
+
+    # Required Work Time (minus 1 hour break, wraps past midnight)
+    shift_diff = end - start
+    df['Required Work Time'] = format_duration(np.where(shift_diff >= 0, shift_diff - 3600, shift_diff + 86400 - 3600))
+
+    # Work Time: Use `Out` first, fallback to `Clock-Out` (minus 1 hour break, wraps past midnight)
+    out_diff = out_time - clock_in
+    clock_out_diff = clock_out - clock_in
+    df['Work Time'] = format_duration(np.select(
+        [has_out & (out_diff >= 0), has_out, has_clock_out & (clock_out_diff >= 0), has_clock_out],
+        [out_diff - 3600, out_diff + 86400 - 3600, clock_out_diff - 3600, clock_out_diff + 86400 - 3600],
+        0
+    ))
+
+    df['Absent'] = np.where(has_clock_in | has_clock_out, '00:00', df['Required Work Time'])
+
+    # OT1 on weekdays, OT2 on weekends
+    ot_diff = time_to_seconds(df['Work Time']) - time_to_seconds(df['Required Work Time'])
+    weekday = df['Workday'].isin(['Mon.', 'Tues.', 'Wed.', 'Thur.', 'Fri.']).to_numpy()
+    weekend = df['Workday'].isin(['Sat.', 'Sun.']).to_numpy()
+    ot = format_duration(ot_diff)
+    df['OT1'] = np.where(weekday & (ot_diff > 0), ot, '00:00')
+    df['OT2'] = np.where(weekend & (ot_diff > 0), ot, '00:00')
+    df['OT3'] = '00:00'
+
+    return df
+
 @app.post("/generate-attendance-report")
 async def generate_attendance_report(
     db_file: UploadFile = File(..., description="ZK.db SQLite database file"),
@@ -43,247 +255,20 @@ async def generate_attendance_report(
     
     # Create temporary file for uploaded database
     with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_db:
-        content = await db_file.read()
-        temp_db.write(content)
+        # Copy in 1 MiB blocks so the whole upload is never held in memory
+        shutil.copyfileobj(db_file.file, temp_db, length=1024 * 1024)
         temp_db_path = temp_db.name
     
     try:
-        # Connect to the temporary database
-        conn = sqlite3.connect(temp_db_path)
-        
-        # Modified SQL query to use date parameters
-        query = f"""
-        WITH punches_per_day AS (
-            SELECT 
-                p.employee_id,
-                date(p.punch_time) AS punch_date,
-                time(p.punch_time) AS punch_time,
-                p.punch_time AS full_punch_time
-            FROM att_punches p
-            WHERE strftime('%Y-%m', p.punch_time) >= '{start_date}'
-            AND strftime('%Y-%m', p.punch_time) <= '{end_date}'
-        ),
-
-        ranked_punches AS (
-            SELECT
-                p.employee_id,
-                p.punch_date,
-                p.punch_time,
-                ROW_NUMBER() OVER (PARTITION BY p.employee_id, p.punch_date ORDER BY p.full_punch_time ASC) AS rn
-            FROM punches_per_day p
-        ),
-
-        final AS (
-            SELECT
-                e.emp_pin AS employee_id,
-                e.emp_firstname || ' ' || COALESCE(e.emp_lastname, '') AS full_name,
-                d.dept_name AS department,
-                r.punch_date AS Date,
-                CASE strftime('%w', r.punch_date)
-                    WHEN '0' THEN 'Sun.'
-                    WHEN '1' THEN 'Mon.'
-                    WHEN '2' THEN 'Tues.'
-                    WHEN '3' THEN 'Wed.'
-                    WHEN '4' THEN 'Thur.'
-                    WHEN '5' THEN 'Fri.'
-                    WHEN '6' THEN 'Sat.'
-                END AS Workday,
-                tt.timetable_name AS Timetable,
-                time(tt.timetable_start) AS StartWorkTime,
-                time(tt.timetable_end) AS EndWorkTime,
-                MAX(CASE WHEN r.rn = 1 THEN r.punch_time END) AS `Clock-In`,
-                MAX(CASE WHEN r.rn = 2 THEN r.punch_time END) AS `Clock-Out`,
-                MAX(CASE WHEN r.rn = 3 THEN r.punch_time END) AS `In`,
-                MAX(CASE WHEN r.rn = 4 THEN r.punch_time END) AS `Out`
-            FROM ranked_punches r
-            JOIN hr_employee e ON e.id = r.employee_id
-            LEFT JOIN hr_department d ON e.department_id = d.id
-            LEFT JOIN att_day_details ad ON ad.employee_id = r.employee_id AND date(ad.att_date) = r.punch_date
-            LEFT JOIN att_timetable tt ON ad.timetable_id = tt.id
-            GROUP BY e.emp_pin, e.emp_firstname, e.emp_lastname, d.dept_name, r.punch_date, tt.timetable_name, tt.timetable_start, tt.timetable_end
-        ),
-
-        with_flags AS (
-            SELECT 
-                *,
-                -- Late Clock In
-                CASE 
-                    WHEN time(`Clock-In`) > time(StartWorkTime)
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) / 3600,
-                        ((strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Late Clock In`,
-
-                -- Early Clock In
-                CASE 
-                    WHEN time(`Clock-In`) < time(StartWorkTime)
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) / 3600,
-                        ((strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Early Clock In`,
-
-                -- Early Clock Out: Use `Out` first, fallback to `Clock-Out`
-                CASE 
-                    WHEN (`Out` IS NOT NULL AND time(`Out`) < time(EndWorkTime))
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) / 3600,
-                        ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) % 3600) / 60
-                    )
-                    WHEN (`Out` IS NULL AND `Clock-Out` IS NOT NULL AND time(`Clock-Out`) < time(EndWorkTime))
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) / 3600,
-                        ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Early Clock Out`,
-
-                -- Break
-                printf('%02d:%02d',
-                    CASE
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                            THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)))
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                            THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400)
-                        ELSE 0
-                    END / 3600,
-                    CASE
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                            THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400) % 3600) / 60
-                        ELSE 0
-                    END
-                ) AS `Break`
-            FROM final
-        ),
-
-        with_work_time AS (
-            SELECT 
-                *,
-                -- Required Work Time
-                printf('%02d:%02d',
-                    CASE 
-                        WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                        THEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600)
-                        ELSE (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600)
-                    END / 3600,
-                    CASE 
-                        WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                        THEN ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600) % 3600) / 60
-                        ELSE ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600) % 3600) / 60
-                    END
-                ) AS `Required Work Time`,
-
-                -- Work Time
-                printf('%02d:%02d',
-                    CASE
-                        WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
-                        WHEN `Out` IS NOT NULL
-                            THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
-                        WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
-                        WHEN `Clock-Out` IS NOT NULL
-                            THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
-                        ELSE 0
-                    END / 3600,
-                    CASE
-                        WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
-                        WHEN `Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
-                        WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
-                        WHEN `Clock-Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
-                        ELSE 0
-                    END
-                ) AS `Work Time`
-            FROM with_flags
-        ),
-
-        final_with_ot AS (
-            SELECT 
-                *,
-                CASE 
-                    WHEN `Clock-In` IS NOT NULL OR `Clock-Out` IS NOT NULL
-                    THEN '00:00'
-                    ELSE `Required Work Time`
-                END AS `Absent`,
-
-                CASE 
-                    WHEN Workday IN ('Mon.', 'Tues.', 'Wed.', 'Thur.', 'Fri.')
-                         AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
-                    THEN printf('%02d:%02d',
-                        (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                        ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `OT1`,
-
-                CASE 
-                    WHEN Workday IN ('Sat.', 'Sun.')
-                         AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
-                    THEN printf('%02d:%02d',
-                        (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                        ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `OT2`,
-
-                '00:00' AS `OT3`
-            FROM with_work_time
-        )
-        SELECT 
-            employee_id,
-            full_name,
-            department,
-            Date,
-            Workday,
-            Timetable,
-            `Required Work Time`,
-            StartWorkTime,
-            EndWorkTime,
-            `Clock-In`,
-            `Clock-Out`,
-            `In`,
-            `Out`,
-            `Late Clock In`,
-            `Early Clock In`,
-            `Early Clock Out`,
-            `Break`,
-            `Work Time`,
-            `Absent`,
-            `OT1`,
-            `OT2`,
-            `OT3`
-        FROM final_with_ot
-        ORDER BY employee_id, Date;
-        """
-        
-        df = pd.read_sql_query(query, conn)
-        
-        if df.empty:
-            raise HTTPException(status_code=404, detail="No attendance data found for the specified date range")
-        
-        # Get company name for title
-        title_query = "SELECT cmp_name FROM hr_company LIMIT 1;"
-        title_df = pd.read_sql_query(title_query, conn)
-        company_name = title_df.iloc[0]['cmp_name'] if not title_df.empty else "Company Name"
-        
-        conn.close()
-        
-        # Generate Excel file using the same logic as saya.py
-        output_file = generate_excel_report(df, company_name, start_date, end_date)
+        # SQLite, pandas and Excel work is blocking, so run it all in a worker thread to keep the event loop free
+        output_file = await anyio.to_thread.run_sync(build_attendance_report, temp_db_path, start_date, end_date)
         
         return FileResponse(
             path=output_file,
             filename=f"attendance_report_{start_date}_to_{end_date}.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"X-Accel-Buffering": "no"},
+            background=BackgroundTask(os.unlink, output_file)
         )
         
     except sqlite3.Error as e:
@@ -295,154 +280,193 @@ async def generate_attendance_report(
         if os.path.exists(temp_db_path):
             os.unlink(temp_db_path)
 
+def build_attendance_report(temp_db_path, start_date, end_date):
+    """Query the uploaded database and write the Excel report; returns the report file path"""
+    # Connect to the temporary database
+    conn = sqlite3.connect(temp_db_path)
+    
+    # Throwaway copy: skip journaling/fsync, keep temp tables and a 256 MB page cache in memory
+    conn.executescript("""
+        PRAGMA journal_mode=OFF;
+        PRAGMA synchronous=OFF;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-262144;
+        PRAGMA mmap_size=268435456;
+    """)
+    
+    # Indexes for the punch_time range seek, the per-employee punch grouping and the day details join;
+    # ANALYZE so the planner can choose between them
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS ix_att_punches_time ON att_punches(punch_time, employee_id);
+        CREATE INDEX IF NOT EXISTS ix_punches_emp_time ON att_punches(employee_id, punch_time);
+        CREATE INDEX IF NOT EXISTS ix_adday ON att_day_details(employee_id, att_date);
+        ANALYZE att_punches;
+        ANALYZE att_day_details;
+    """)
+    
+    # Read-only from here on
+    conn.execute("PRAGMA query_only=1")
+    
+    # Month range as a half-open timestamp range: first day of start month to first day after end month
+    start_month = datetime.strptime(start_date, "%Y-%m")
+    end_month = datetime.strptime(end_date, "%Y-%m")
+    range_start = start_month.strftime("%Y-%m-01")
+    range_end = f"{end_month.year + end_month.month // 12:04d}-{end_month.month % 12 + 1:02d}-01"
+    
+    # Read in chunks, storing the heavily repeated text columns as categoricals
+    chunks = [chunk.astype(CATEGORY_DTYPES) for chunk in pd.read_sql_query(ATTENDANCE_QUERY, conn, params=(range_start, range_end), chunksize=READ_CHUNK_SIZE)]
+    df = pd.concat(chunks, ignore_index=True).astype(CATEGORY_DTYPES) if chunks else pd.DataFrame()
+    
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No attendance data found for the specified date range")
+    
+    # Clock-In, Clock-Out, In, Out from each day's punches
+    df = split_punches(df)
+    
+    # Late/Early, Break, Work Time, Absent and OT columns
+    df = calculate_attendance_columns(df)
+    
+    # Get company name for title
+    company_row = conn.execute(COMPANY_QUERY).fetchone()
+    company_name = company_row[0] if company_row else "Company Name"
+    
+    conn.close()
+    
+    # Generate Excel file using the same logic as saya.py
+    output_file = generate_excel_report(df, company_name, start_date, end_date)
+    
+    return output_file
+
 def generate_excel_report(df, company_name, start_date, end_date):
     """Generate Excel report using the same formatting logic as saya.py"""
     
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Attendance"
-
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Create fonts and fills (same as saya.py)
-    tahoma_font = Font(name='Tahoma', size=10)
-    tahoma_bold_font = Font(name='Tahoma', size=10, bold=True)
-    yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-    red_fill = PatternFill(start_color='FFCCCB', end_color='FFCCCB', fill_type='solid')
-    bright_red_font = Font(name='Tahoma', size=10, color='FF0000')
-    orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
-    green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-    header_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-    total_base_fill = PatternFill(start_color='FFCC99', end_color='FFCC99', fill_type='solid')
-    total_day_fill = PatternFill(start_color='E2EFDA', end_color='E2EFDA', fill_type='solid')
-    clock_header_fill = PatternFill(start_color='FFE4B5', end_color='FFE4B5', fill_type='solid')
-    ot_header_fill = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')
-    penalty_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-    title_font = Font(name='Tahoma', size=22, bold=True)
-    subtitle_font = Font(name='Tahoma', size=14, bold=True)
-
-    current_row = 1
-
-    # Add company name title at the top
-    ws.cell(row=current_row, column=1, value=company_name).font = title_font
-    current_row += 2
-
-    # Add subtitle with date range
-    ws.cell(row=current_row, column=1, value=f"Monthly Statement Report ({start_date} to {end_date})").font = subtitle_font
-    current_row += 2
-
-    # Write column headers
+    # Unique temp file per report; the endpoint deletes it once the download is sent
+    fd, filename = tempfile.mkstemp(prefix="attendance_report_", suffix=".xlsx")
+    os.close(fd)
+
     cols_to_show = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent', 'Penalty', 'OT1', 'OT2', 'OT3', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
     colored_header_columns = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent']
-    
-    for col_idx, col_name in enumerate(cols_to_show, start=1):
-        header_cell = ws.cell(row=current_row, column=col_idx, value=col_name)
-        header_cell.font = tahoma_bold_font
-        header_cell.alignment = Alignment(wrap_text=True)
-        
-        # Apply background color to specific columns
-        if col_name in colored_header_columns:
-            header_cell.fill = header_fill
-        elif col_name == 'Total Base':
-            header_cell.fill = total_base_fill
-        elif col_name in ['Total Day', 'Night Shift', 'Allowence']:
-            header_cell.fill = total_day_fill
-        elif col_name in ['Clock-In', 'Clock-Out', 'In', 'Out']:
-            header_cell.fill = clock_header_fill
-        elif col_name in ['OT1', 'OT2', 'OT3']:
-            header_cell.fill = ot_header_fill
-        elif col_name == 'Penalty':
-            header_cell.fill = penalty_fill
-    
-    ws.row_dimensions[current_row].height = 39.75
-    current_row += 1
-
-    # Function to format time from HH:MM:SS to HH:MM
-    def format_time(time_str):
-        if not time_str or time_str == '':
-            return time_str
-        try:
-            if time_str.count(':') == 2:
-                parts = time_str.split(':')
-                return f"{parts[0]}:{parts[1]}"
-            else:
-                return time_str
-        except:
-            return time_str
-
-    # Process each employee
-    for emp_id, group in df.groupby('employee_id'):
-        emp_info = group.iloc[0]
-
-        # Write employee info
-        ws.cell(row=current_row, column=1, value="Employee ID").font = tahoma_bold_font
-        ws.cell(row=current_row, column=2, value=emp_id).font = tahoma_font
-        ws.cell(row=current_row, column=3, value="Full Name").font = tahoma_bold_font
-        ws.cell(row=current_row, column=4, value=emp_info['full_name']).font = tahoma_font
-        ws.row_dimensions[current_row].height = 18
-        current_row += 1
-
-        # Write data rows (simplified version of the original logic)
-        for _, row in group.iterrows():
-            is_sunday = row.get('Workday') == 'Sun.'
-            
-            for col_idx, col_name in enumerate(cols_to_show, start=1):
-                # Set value based on column name
-                if col_name == 'EYEE NAME':
-                    cell_value = emp_info['full_name']
-                elif col_name == 'Penalty':
-                    cell_value = '0.0'
-                elif col_name == 'Night Shift':
-                    original_timetable = row.get('Timetable', "")
-                    cell_value = '2.0' if 'NIGHT' in str(original_timetable).upper() else '0.0'
-                elif col_name == 'Allowence':
-                    cell_value = '0.0'
+
+    # Columns shown as HH:MM and the data columns copied straight from the query
+    time_cols = ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']
+    value_cols = [c for c in cols_to_show if c in df.columns and c not in time_cols]
+
+    blank_row = [None] * len(cols_to_show)
+    blank_styles = [BLANK_STYLE] * len(cols_to_show)
+
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        zf.writestr('_rels/.rels', ROOT_RELS_XML)
+        zf.writestr('xl/workbook.xml', WORKBOOK_XML)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+        zf.writestr('xl/styles.xml', STYLES_XML)
+
+        # Stream the sheet XML into the archive as rows are built
+        with io.TextIOWrapper(zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True), encoding='utf-8') as sheet:
+            sheet.write(SHEET_HEAD_XML + '<sheetData>')
+            current_row = 1
+
+            # Add company name title at the top
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, [company_name], [TITLE_STYLE]))
+            current_row += 2
+
+            # Add subtitle with date range
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, [f"Monthly Statement Report ({start_date} to {end_date})"], [SUBTITLE_STYLE]))
+            current_row += 2
+
+            # Write column headers
+            header_styles = []
+            for col_name in cols_to_show:
+                # Apply background color to specific columns
+                if col_name in colored_header_columns:
+                    header_styles.append(HEADER_STYLE)
                 elif col_name == 'Total Base':
-                    cell_value = '0.0' if is_sunday else '1.0'
-                elif col_name == 'Day':
-                    if is_sunday:
-                        cell_value = ''
-                    else:
-                        clock_in = row.get('Clock-In', '')
-                        clock_out = row.get('Clock-Out', '')
-                        cell_value = '1.0' if (clock_in or clock_out) else ''
-                elif col_name in ['H', 'MC', 'AL', 'UP', 'S']:
-                    cell_value = ''
-                elif col_name == 'Total Day':
-                    cell_value = '1.0'
-                elif col_name in ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']:
-                    cell_value = format_time(row.get(col_name, ""))
-                else:
-                    cell_value = row.get(col_name, "")
-                
-                cell = ws.cell(row=current_row, column=col_idx, value=cell_value)
-                cell.font = tahoma_font
-                
-                # Apply basic coloring (simplified)
-                if col_name == 'Penalty' and cell_value and cell_value != '' and not is_sunday:
-                    cell.fill = penalty_fill
-                elif col_name == 'Total Base' and cell_value and cell_value != '' and not is_sunday:
-                    cell.fill = total_base_fill
-                elif col_name in ['Total Day', 'Night Shift', 'Allowence'] and cell_value and cell_value != '' and not is_sunday:
-                    cell.fill = total_day_fill
-                elif is_sunday:
-                    cell.fill = yellow_fill
-            
-            ws.row_dimensions[current_row].height = 18
+                    header_styles.append(HEADER_TOTAL_BASE_STYLE)
+                elif col_name in ['Total Day', 'Night Shift', 'Allowence']:
+                    header_styles.append(HEADER_TOTAL_DAY_STYLE)
+                elif col_name in ['Clock-In', 'Clock-Out', 'In', 'Out']:
+                    header_styles.append(HEADER_CLOCK_STYLE)
+                elif col_name in ['OT1', 'OT2', 'OT3']:
+                    header_styles.append(HEADER_OT_STYLE)
+                elif col_name == 'Penalty':
+                    header_styles.append(HEADER_PENALTY_STYLE)
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, cols_to_show, header_styles, height=39.75))
             current_row += 1
 
-        current_row += 2  # Add space after each employee
+            # Process each employee
+            for emp_index, (emp_id, group) in enumerate(df.groupby('employee_id', sort=False)):
+                emp_info = group.iloc[0]
+
+                # Two bordered blank rows between employees
+                if emp_index > 0:
+                    for _ in range(2):
+                        sheet.write(xml_row(COLUMN_LETTERS, current_row, blank_row, blank_styles))
+                        current_row += 1
+
+                # Write employee info
+                info_values = ["Employee ID", emp_id, "Full Name", emp_info['full_name']] + blank_row[4:]
+                info_styles = [LABEL_STYLE, DEFAULT_STYLE, LABEL_STYLE, DEFAULT_STYLE] + blank_styles[4:]
+                sheet.write(xml_row(COLUMN_LETTERS, current_row, info_values, info_styles, height=18))
+                current_row += 1
+
+                # Pull the group's columns out as plain arrays once; times sliced from HH:MM:SS to HH:MM
+                columns = {c: group[c].to_numpy(dtype=object, na_value=None) for c in value_cols}
+                for c in time_cols:
+                    columns[c] = group[c].fillna('').astype(str).str.slice(0, 5).to_numpy()
+
+                # Per-row flags computed once per employee as boolean arrays
+                sunday_mask = columns['Workday'] == 'Sun.'
+                night_mask = pd.Series(columns['Timetable']).fillna('').astype(str).str.upper().str.contains('NIGHT', regex=False).to_numpy()
+                has_punch = (columns['Clock-In'] != '') | (columns['Clock-Out'] != '')
 
-    # Apply borders
-    for row in ws.iter_rows(min_row=5, max_row=ws.max_row, min_col=1, max_col=len(cols_to_show)):
-        for cell in row:
-            cell.border = thin_border
+                # Write data rows (simplified version of the original logic)
+                for i in range(len(group)):
+                    is_sunday = sunday_mask[i]
+                    
+                    row_values = []
+                    row_styles = []
+                    for col_name in cols_to_show:
+                        # Set value based on column name
+                        if col_name == 'EYEE NAME':
+                            cell_value = emp_info['full_name']
+                        elif col_name == 'Penalty':
+                            cell_value = '0.0'
+                        elif col_name == 'Night Shift':
+                            cell_value = '2.0' if night_mask[i] else '0.0'
+                        elif col_name == 'Allowence':
+                            cell_value = '0.0'
+                        elif col_name == 'Total Base':
+                            cell_value = '0.0' if is_sunday else '1.0'
+                        elif col_name == 'Day':
+                            if is_sunday:
+                                cell_value = ''
+                            else:
+                                cell_value = '1.0' if has_punch[i] else ''
+                        elif col_name in ['H', 'MC', 'AL', 'UP', 'S']:
+                            cell_value = ''
+                        elif col_name == 'Total Day':
+                            cell_value = '1.0'
+                        else:
+                            cell_value = columns[col_name][i]
+                        
+                        # Apply basic coloring (simplified)
+                        style = DEFAULT_STYLE
+                        if col_name == 'Penalty' and cell_value and cell_value != '' and not is_sunday:
+                            style = PENALTY_STYLE
+                        elif col_name == 'Total Base' and cell_value and cell_value != '' and not is_sunday:
+                            style = TOTAL_BASE_STYLE
+                        elif col_name in ['Total Day', 'Night Shift', 'Allowence'] and cell_value and cell_value != '' and not is_sunday:
+                            style = TOTAL_DAY_STYLE
+                        elif is_sunday:
+                            style = SUNDAY_STYLE
+                        
+                        row_values.append(cell_value)
+                        row_styles.append(style)
+                    
+                    sheet.write(xml_row(COLUMN_LETTERS, current_row, row_values, row_styles, height=18))
+                    current_row += 1
 
-    # Save file
-    random_num = random.randint(1000, 9999)
-    filename = f"attendance_report_{random_num}.xlsx"
-    wb.save(filename)
+            sheet.write(SHEET_TAIL_XML)
     
     return filename
 
@@ -458,5 +482,14 @@ async def root():
     }
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # Multiple workers need the app as an import string; uvloop is not available on Windows
+    uvicorn.run(
+        "api_main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=4,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
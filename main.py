@@ -1,17 +1,115 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 import sqlite3
 import pandas as pd
-import random
 import tempfile
+import shutil
 import os
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Border, Side, Font, PatternFill, Alignment
+import io
+import zipfile
+from datetime import datetime, timedelta
 from typing import Optional
+from xlsx_xml import (CONTENT_TYPES_XML, ROOT_RELS_XML, WORKBOOK_XML, WORKBOOK_RELS_XML, SHEET_HEAD_XML, SHEET_TAIL_XML,
+                      solid_fill_xml, xf_xml, column_letters, xml_row)
 
 app = FastAPI(title="Attendance Report Generator", version="1.0.0")
 
+# Fonts and fills used by the report; cellXfs indexes are the *_STYLE constants and DATA_STYLES below
+# Data cell fills by name -> fillId; None is no fill
+DATA_FILLS = {None: 0, 'penalty': 7, 'total_base': 3, 'total_day': 4, 'yellow': 8, 'red': 9, 'orange': 10}
+
+# Data cell style for each (bright red font, fill name) pair, numbered after the fixed styles
+DATA_STYLES = {key: 14 + i for i, key in enumerate((red_font, fill) for red_font in (False, True) for fill in DATA_FILLS)}
+
+# Fill applied to non-empty, non-Sunday data cells of these columns
+STYLE_RULES = {'Penalty': 'penalty', 'Total Base': 'total_base', 'Total Day': 'total_day', 'Night Shift': 'total_day', 'Allowence': 'total_day'}
+
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="7">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="10"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="22"/><name val="Tahoma"/></font>'
+    '<font><b/><sz val="14"/><name val="Tahoma"/></font>'
+    '<font><i/><sz val="9"/><name val="Tahoma"/></font>'
+    '<font><sz val="10"/><color rgb="FFFF0000"/><name val="Tahoma"/></font>'
+    '</fonts>'
+    '<fills count="12">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    + solid_fill_xml('FFF2CC')   # 2 header
+    + solid_fill_xml('FFCC99')   # 3 total base
+    + solid_fill_xml('E2EFDA')   # 4 total day
+    + solid_fill_xml('FFE4B5')   # 5 clock header
+    + solid_fill_xml('ADD8E6')   # 6 OT header
+    + solid_fill_xml('E6E6FA')   # 7 penalty
+    + solid_fill_xml('FFFF00')   # 8 yellow (Sunday)
+    + solid_fill_xml('FFCCCB')   # 9 light red (late clock in / early clock out)
+    + solid_fill_xml('FFA500')   # 10 orange (suspicious punch pattern)
+    + solid_fill_xml('90EE90')   # 11 green (total rows)
+    + '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    f'<cellXfs count="{14 + len(DATA_STYLES)}">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    + xf_xml(3, border=0)                 # 1 title
+    + xf_xml(4, border=0)                 # 2 subtitle
+    + xf_xml(5, border=0)                 # 3 note
+    + xf_xml(2, wrap=True)                # 4 header - no fill
+    + xf_xml(2, 2, wrap=True)             # 5 header
+    + xf_xml(2, 3, wrap=True)             # 6 header - Total Base
+    + xf_xml(2, 4, wrap=True)             # 7 header - Total Day / Night Shift / Allowence
+    + xf_xml(2, 5, wrap=True)             # 8 header - Clock-In / Clock-Out / In / Out
+    + xf_xml(2, 6, wrap=True)             # 9 header - OT
+    + xf_xml(2, 7, wrap=True)             # 10 header - Penalty
+    + xf_xml(2)                           # 11 bold label
+    + xf_xml(0)                           # 12 blank bordered cell
+    + xf_xml(2, 11)                       # 13 total row
+    + ''.join(xf_xml(6 if red_font else 1, DATA_FILLS[fill]) for red_font, fill in DATA_STYLES)  # 14+ data cells
+    + '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+TITLE_STYLE = 1
+SUBTITLE_STYLE = 2
+NOTE_STYLE = 3
+HEADER_PLAIN_STYLE = 4
+HEADER_STYLE = 5
+HEADER_TOTAL_BASE_STYLE = 6
+HEADER_TOTAL_DAY_STYLE = 7
+HEADER_CLOCK_STYLE = 8
+HEADER_OT_STYLE = 9
+HEADER_PENALTY_STYLE = 10
+LABEL_STYLE = 11
+BLANK_STYLE = 12
+TOTAL_STYLE = 13
+
+# Sheet view after SHEET_HEAD_XML: outline summaries, panes frozen below the column headers (row 6); <cols> and <sheetData> follow
+SHEET_VIEW_XML = (
+    '<sheetPr><outlinePr summaryBelow="1" summaryRight="1"/></sheetPr>'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="5" topLeftCell="A6" activePane="bottomLeft" state="frozen"/>'
+    '<selection pane="bottomLeft" activeCell="A1" sqref="A1"/>'
+    '</sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15" outlineLevelRow="1" outlineLevelCol="1"/>'
+)
+
+# Column letters A..AH for the 34 report columns
+COLUMN_LETTERS = column_letters(34)
+
+def format_decimal_hours(value):
+    """Format decimal hours with up to 2 decimals and no trailing zeros (2.50 -> "2.5", 3.00 -> "3")"""
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
 @app.post("/generate-attendance-report")
 async def generate_attendance_report(
     db_file: UploadFile = File(..., description="ZK.db SQLite database file"),
@@ -42,296 +140,13 @@ async def generate_attendance_report(
     
     # Create temporary file for uploaded database
     with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_db:
-        content = await db_file.read()
-        temp_db.write(content)
+        # Copy in 1 MiB blocks so the whole upload is never held in memory
+        shutil.copyfileobj(db_file.file, temp_db, length=1024 * 1024)
         temp_db_path = temp_db.name
     
     try:
-        # Connect to the temporary database
-        conn = sqlite3.connect(temp_db_path)
-        
-        # If end_date is not provided, find the latest date in the database
-        if not end_date:
-            max_date_query = """
-            SELECT MAX(date(punch_time)) as max_punch_date
-            FROM att_punches
-            UNION
-            SELECT MAX(date(att_date)) as max_att_date
-            FROM att_day_details
-            ORDER BY max_punch_date DESC
-            LIMIT 1
-            """
-            max_date_result = pd.read_sql_query(max_date_query, conn)
-            if not max_date_result.empty and max_date_result.iloc[0]['max_punch_date']:
-                end_date = max_date_result.iloc[0]['max_punch_date']
-                print(f"DEBUG: end_date was empty, set to latest database date: {end_date}")
-            else:
-                # Fallback to start_date if no data found
-                end_date = start_date
-                print(f"DEBUG: No data found in database, using start_date as end_date: {end_date}")
-        
-        # Modified SQL query to use date parameters and include all dates in range
-        query = f"""
-        WITH RECURSIVE date_range AS (
-            SELECT '{start_date}' AS date_value
-            UNION ALL
-            SELECT date(date_value, '+1 day')
-            FROM date_range
-            WHERE date_value < '{end_date}'
-        ),
-
-        employees_in_period AS (
-            SELECT DISTINCT e.id as employee_id, e.emp_pin, e.emp_firstname, e.emp_lastname, e.department_id
-            FROM hr_employee e
-            WHERE e.id IN (
-                SELECT DISTINCT employee_id 
-                FROM att_punches 
-                WHERE date(punch_time) >= '{start_date}' AND date(punch_time) <= '{end_date}'
-                UNION
-                SELECT DISTINCT employee_id 
-                FROM att_day_details 
-                WHERE date(att_date) >= '{start_date}' AND date(att_date) <= '{end_date}'
-            )
-        ),
-
-        all_employee_dates AS (
-            SELECT 
-                ep.employee_id,
-                ep.emp_pin,
-                ep.emp_firstname, 
-                ep.emp_lastname,
-                ep.department_id,
-                dr.date_value as punch_date
-            FROM date_range dr
-            CROSS JOIN employees_in_period ep
-        ),
-
-        punches_per_day AS (
-            SELECT 
-                p.employee_id,
-                date(p.punch_time) AS punch_date,
-                time(p.punch_time) AS punch_time,
-                p.punch_time AS full_punch_time
-            FROM att_punches p
-            WHERE date(p.punch_time) >= '{start_date}'
-            AND date(p.punch_time) <= '{end_date}'
-        ),
-
-        ranked_punches AS (
-            SELECT
-                p.employee_id,
-                p.punch_date,
-                p.punch_time,
-                ROW_NUMBER() OVER (PARTITION BY p.employee_id, p.punch_date ORDER BY p.full_punch_time ASC) AS rn
-            FROM punches_per_day p
-        ),
-
-        final AS (
-            SELECT
-                aed.emp_pin AS employee_id,
-                aed.emp_firstname || ' ' || COALESCE(aed.emp_lastname, '') AS full_name,
-                d.dept_name AS department,
-                aed.punch_date AS Date,
-                CASE strftime('%w', aed.punch_date)
-                    WHEN '0' THEN 'Sun.'
-                    WHEN '1' THEN 'Mon.'
-                    WHEN '2' THEN 'Tues.'
-                    WHEN '3' THEN 'Wed.'
-                    WHEN '4' THEN 'Thur.'
-                    WHEN '5' THEN 'Fri.'
-                    WHEN '6' THEN 'Sat.'
-                END AS Workday,
-                tt.timetable_name AS Timetable,
-                time(tt.timetable_start) AS StartWorkTime,
-                time(tt.timetable_end) AS EndWorkTime,
-                MAX(CASE WHEN r.rn = 1 THEN r.punch_time END) AS `Clock-In`,
-                MAX(CASE WHEN r.rn = 2 THEN r.punch_time END) AS `Clock-Out`,
-                MAX(CASE WHEN r.rn = 3 THEN r.punch_time END) AS `In`,
-                MAX(CASE WHEN r.rn = 4 THEN r.punch_time END) AS `Out`
-            FROM all_employee_dates aed
-            LEFT JOIN ranked_punches r ON r.employee_id = aed.employee_id AND r.punch_date = aed.punch_date
-            LEFT JOIN hr_department d ON aed.department_id = d.id
-            LEFT JOIN att_day_details ad ON ad.employee_id = aed.employee_id AND date(ad.att_date) = aed.punch_date
-            LEFT JOIN att_timetable tt ON ad.timetable_id = tt.id
-            GROUP BY aed.emp_pin, aed.emp_firstname, aed.emp_lastname, d.dept_name, aed.punch_date, tt.timetable_name, tt.timetable_start, tt.timetable_end
-        ),
-
-        with_flags AS (
-            SELECT 
-                *,
-                -- Late Clock In
-                CASE 
-                    WHEN time(`Clock-In`) > time(StartWorkTime)
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) / 3600,
-                        ((strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Late Clock In`,
-
-                -- Early Clock In
-                CASE 
-                    WHEN time(`Clock-In`) < time(StartWorkTime)
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) / 3600,
-                        ((strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Early Clock In`,
-
-                -- Early Clock Out: Use `Out` first, fallback to `Clock-Out`
-                CASE 
-                    WHEN (`Out` IS NOT NULL AND time(`Out`) < time(EndWorkTime))
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) / 3600,
-                        ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) % 3600) / 60
-                    )
-                    WHEN (`Out` IS NULL AND `Clock-Out` IS NOT NULL AND time(`Clock-Out`) < time(EndWorkTime))
-                    THEN printf('%02d:%02d', 
-                        (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) / 3600,
-                        ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `Early Clock Out`,
-
-                -- Break
-                printf('%02d:%02d',
-                    CASE
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                            THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)))
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                            THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400)
-                        ELSE 0
-                    END / 3600,
-                    CASE
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                            THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
-                        WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400) % 3600) / 60
-                        ELSE 0
-                    END
-                ) AS `Break`
-            FROM final
-        ),
-
-        with_work_time AS (
-            SELECT 
-                *,
-                -- Required Work Time
-                printf('%02d:%02d',
-                    CASE 
-                        WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                        THEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600)
-                        ELSE (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600)
-                    END / 3600,
-                    CASE 
-                        WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                        THEN ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600) % 3600) / 60
-                        ELSE ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600) % 3600) / 60
-                    END
-                ) AS `Required Work Time`,
-
-                -- Work Time
-                printf('%02d:%02d',
-                    CASE
-                        WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
-                        WHEN `Out` IS NOT NULL
-                            THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
-                        WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
-                        WHEN `Clock-Out` IS NOT NULL
-                            THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
-                        ELSE 0
-                    END / 3600,
-                    CASE
-                        WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
-                        WHEN `Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
-                        WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                            THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
-                        WHEN `Clock-Out` IS NOT NULL
-                            THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
-                        ELSE 0
-                    END
-                ) AS `Work Time`
-            FROM with_flags
-        ),
-
-        final_with_ot AS (
-            SELECT 
-                *,
-                CASE 
-                    WHEN `Clock-In` IS NOT NULL OR `Clock-Out` IS NOT NULL
-                    THEN '00:00'
-                    ELSE `Required Work Time`
-                END AS `Absent`,
-
-                CASE 
-                    WHEN Workday IN ('Mon.', 'Tues.', 'Wed.', 'Thur.', 'Fri.')
-                         AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
-                    THEN printf('%02d:%02d',
-                        (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                        ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `OT1`,
-
-                CASE 
-                    WHEN Workday IN ('Sat.', 'Sun.')
-                         AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
-                    THEN printf('%02d:%02d',
-                        (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                        ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
-                    )
-                    ELSE '00:00'
-                END AS `OT2`,
-
-                '00:00' AS `OT3`
-            FROM with_work_time
-        )
-        SELECT 
-            employee_id,
-            full_name,
-            department,
-            Date,
-            Workday,
-            Timetable,
-            `Required Work Time`,
-            StartWorkTime,
-            EndWorkTime,
-            `Clock-In`,
-            `Clock-Out`,
-            `In`,
-            `Out`,
-            `Late Clock In`,
-            `Early Clock In`,
-            `Early Clock Out`,
-            `Break`,
-            `Work Time`,
-            `Absent`,
-            `OT1`,
-            `OT2`,
-            `OT3`
-        FROM final_with_ot
-        ORDER BY employee_id, Date;
-        """
-        
-        df = pd.read_sql_query(query, conn)
-        
-        if df.empty:
-            raise HTTPException(status_code=404, detail="No attendance data found for the specified date range")
-        
-        # Get company name for title
-        title_query = "SELECT cmp_name FROM hr_company LIMIT 1;"
-        title_df = pd.read_sql_query(title_query, conn)
-        company_name = title_df.iloc[0]['cmp_name'] if not title_df.empty else "Company Name"
-        
-        conn.close()
-        
-        # Generate Excel file using the same logic as saya.py
-        output_file = generate_excel_report(df, company_name, start_date, end_date)
+        # SQLite, pandas and Excel work is blocking, so run it on a worker thread
+        output_file, end_date = await run_in_threadpool(build_attendance_report, temp_db_path, start_date, end_date)
         
         # Generate filename based on final date range
         if start_date == end_date:
@@ -342,7 +157,8 @@ async def generate_attendance_report(
         return FileResponse(
             path=output_file,
             filename=report_filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            background=BackgroundTask(os.unlink, output_file)
         )
         
     except sqlite3.Error as e:
@@ -354,6 +170,333 @@ async def generate_attendance_report(
         if os.path.exists(temp_db_path):
             os.unlink(temp_db_path)
 
+def build_attendance_report(temp_db_path, start_date, end_date):
+    """Query the uploaded database and write the Excel report; returns the report file path and the resolved end_date"""
+    # Load the uploaded database into memory so the report queries never touch disk
+    conn = sqlite3.connect(':memory:')
+    source_conn = sqlite3.connect(temp_db_path)
+    source_conn.backup(conn)
+    source_conn.close()
+    
+    # Keep sorts and temp b-trees in memory too
+    conn.execute("PRAGMA temp_store=MEMORY")
+    
+    # Index for the punch_time range seek; also covers the columns the query reads from att_punches
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_punches_time ON att_punches(punch_time, employee_id)")
+    
+    # Read-only from here on
+    conn.execute("PRAGMA query_only=ON")
+    
+    # If end_date is not provided, find the latest date in the database
+    if not end_date:
+        max_date_query = """
+        SELECT MAX(date(punch_time)) as max_punch_date
+        FROM att_punches
+        UNION
+        SELECT MAX(date(att_date)) as max_att_date
+        FROM att_day_details
+        ORDER BY max_punch_date DESC
+        LIMIT 1
+        """
+        max_date_row = conn.execute(max_date_query).fetchone()
+        if max_date_row and max_date_row[0]:
+            end_date = max_date_row[0]
+            print(f"DEBUG: end_date was empty, set to latest database date: {end_date}")
+        else:
+            # Fallback to start_date if no data found
+            end_date = start_date
+            print(f"DEBUG: No data found in database, using start_date as end_date: {end_date}")
+    
+    # Punch and day-detail timestamps are compared as raw text against [start_date, day after end_date)
+    # so the punch_time index can be used for the range
+    range_end = (datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    
+    # Modified SQL query to use date parameters and include all dates in range
+    query = """
+    WITH RECURSIVE date_range AS (
+        SELECT :start_date AS date_value
+        UNION ALL
+        SELECT date(date_value, '+1 day')
+        FROM date_range
+        WHERE date_value < :end_date
+    ),
+
+    employees_in_period AS (
+        SELECT DISTINCT e.id as employee_id, e.emp_pin, e.emp_firstname, e.emp_lastname, e.department_id
+        FROM hr_employee e
+        WHERE e.id IN (
+            SELECT DISTINCT employee_id 
+            FROM att_punches 
+            WHERE punch_time >= :start_date AND punch_time < :range_end
+            UNION
+            SELECT DISTINCT employee_id 
+            FROM att_day_details 
+            WHERE att_date >= :start_date AND att_date < :range_end
+        )
+    ),
+
+    all_employee_dates AS (
+        SELECT 
+            ep.employee_id,
+            ep.emp_pin,
+            ep.emp_firstname, 
+            ep.emp_lastname,
+            ep.department_id,
+            dr.date_value as punch_date
+        FROM date_range dr
+        CROSS JOIN employees_in_period ep
+    ),
+
+    punches_per_day AS (
+        SELECT 
+            p.employee_id,
+            date(p.punch_time) AS punch_date,
+            time(p.punch_time) AS punch_time,
+            p.punch_time AS full_punch_time
+        FROM att_punches p
+        WHERE p.punch_time >= :start_date
+        AND p.punch_time < :range_end
+    ),
+
+    ranked_punches AS (
+        SELECT
+            p.employee_id,
+            p.punch_date,
+            p.punch_time,
+            ROW_NUMBER() OVER (PARTITION BY p.employee_id, p.punch_date ORDER BY p.full_punch_time ASC) AS rn
+        FROM punches_per_day p
+    ),
+
+    final AS (
+        SELECT
+            aed.emp_pin AS employee_id,
+            aed.emp_firstname || ' ' || COALESCE(aed.emp_lastname, '') AS full_name,
+            d.dept_name AS department,
+            aed.punch_date AS Date,
+            CASE strftime('%w', aed.punch_date)
+                WHEN '0' THEN 'Sun.'
+                WHEN '1' THEN 'Mon.'
+                WHEN '2' THEN 'Tues.'
+                WHEN '3' THEN 'Wed.'
+                WHEN '4' THEN 'Thur.'
+                WHEN '5' THEN 'Fri.'
+                WHEN '6' THEN 'Sat.'
+            END AS Workday,
+            tt.timetable_name AS Timetable,
+            time(tt.timetable_start) AS StartWorkTime,
+            time(tt.timetable_end) AS EndWorkTime,
+            MAX(CASE WHEN r.rn = 1 THEN r.punch_time END) AS `Clock-In`,
+            MAX(CASE WHEN r.rn = 2 THEN r.punch_time END) AS `Clock-Out`,
+            MAX(CASE WHEN r.rn = 3 THEN r.punch_time END) AS `In`,
+            MAX(CASE WHEN r.rn = 4 THEN r.punch_time END) AS `Out`
+        FROM all_employee_dates aed
+        LEFT JOIN ranked_punches r ON r.employee_id = aed.employee_id AND r.punch_date = aed.punch_date
+        LEFT JOIN hr_department d ON aed.department_id = d.id
+        LEFT JOIN att_day_details ad ON ad.employee_id = aed.employee_id AND date(ad.att_date) = aed.punch_date
+        LEFT JOIN att_timetable tt ON ad.timetable_id = tt.id
+        GROUP BY aed.emp_pin, aed.emp_firstname, aed.emp_lastname, d.dept_name, aed.punch_date, tt.timetable_name, tt.timetable_start, tt.timetable_end
+    ),
+
+    -- Seconds since midnight for each time column, parsed once and reused by the flag and work time arithmetic
+    with_seconds AS (
+        SELECT 
+            *,
+            strftime('%s', time(`Clock-In`)) % 86400 AS clock_in_s,
+            strftime('%s', time(`Clock-Out`)) % 86400 AS clock_out_s,
+            strftime('%s', time(`In`)) % 86400 AS in_s,
+            strftime('%s', time(`Out`)) % 86400 AS out_s,
+            strftime('%s', time(StartWorkTime)) % 86400 AS start_s,
+            strftime('%s', time(EndWorkTime)) % 86400 AS end_s
+        FROM final
+    ),
+
+    with_flags AS (
+        SELECT 
+            *,
+            -- Late Clock In
+            CASE 
+                WHEN clock_in_s > start_s
+                THEN printf('%02d:%02d', 
+                    (clock_in_s - start_s) / 3600,
+                    ((clock_in_s - start_s) % 3600) / 60
+                )
+                ELSE '00:00'
+            END AS `Late Clock In`,
+
+            -- Early Clock In
+            CASE 
+                WHEN clock_in_s < start_s
+                THEN printf('%02d:%02d', 
+                    (start_s - clock_in_s) / 3600,
+                    ((start_s - clock_in_s) % 3600) / 60
+                )
+                ELSE '00:00'
+            END AS `Early Clock In`,
+
+            -- Early Clock Out: Use `Out` first, fallback to `Clock-Out`
+            CASE 
+                WHEN (`Out` IS NOT NULL AND out_s < end_s)
+                THEN printf('%02d:%02d', 
+                    (end_s - out_s) / 3600,
+                    ((end_s - out_s) % 3600) / 60
+                )
+                WHEN (`Out` IS NULL AND `Clock-Out` IS NOT NULL AND clock_out_s < end_s)
+                THEN printf('%02d:%02d', 
+                    (end_s - clock_out_s) / 3600,
+                    ((end_s - clock_out_s) % 3600) / 60
+                )
+                ELSE '00:00'
+            END AS `Early Clock Out`,
+
+            -- Break
+            printf('%02d:%02d',
+                CASE
+                    WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (in_s - clock_out_s) >= 0
+                        THEN (in_s - clock_out_s)
+                    WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
+                        THEN (in_s - clock_out_s + 86400)
+                    ELSE 0
+                END / 3600,
+                CASE
+                    WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (in_s - clock_out_s) >= 0
+                        THEN ((in_s - clock_out_s) % 3600) / 60
+                    WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
+                        THEN ((in_s - clock_out_s + 86400) % 3600) / 60
+                    ELSE 0
+                END
+            ) AS `Break`
+        FROM with_seconds
+    ),
+
+    with_work_time AS (
+        SELECT 
+            *,
+            -- Required Work Time
+            printf('%02d:%02d',
+                CASE 
+                    WHEN (end_s - start_s) >= 0 
+                    THEN (end_s - start_s - 3600)
+                    ELSE (end_s - start_s + 86400 - 3600)
+                END / 3600,
+                CASE 
+                    WHEN (end_s - start_s) >= 0 
+                    THEN ((end_s - start_s - 3600) % 3600) / 60
+                    ELSE ((end_s - start_s + 86400 - 3600) % 3600) / 60
+                END
+            ) AS `Required Work Time`,
+
+            -- Work Time
+            printf('%02d:%02d',
+                CASE
+                    WHEN `Out` IS NOT NULL AND (out_s - clock_in_s) >= 0
+                        THEN (out_s - clock_in_s - 3600)
+                    WHEN `Out` IS NOT NULL
+                        THEN (out_s - clock_in_s + 86400 - 3600)
+                    WHEN `Clock-Out` IS NOT NULL AND (clock_out_s - clock_in_s) >= 0
+                        THEN (clock_out_s - clock_in_s - 3600)
+                    WHEN `Clock-Out` IS NOT NULL
+                        THEN (clock_out_s - clock_in_s + 86400 - 3600)
+                    ELSE 0
+                END / 3600,
+                CASE
+                    WHEN `Out` IS NOT NULL AND (out_s - clock_in_s) >= 0
+                        THEN ((out_s - clock_in_s - 3600) % 3600) / 60
+                    WHEN `Out` IS NOT NULL
+                        THEN ((out_s - clock_in_s + 86400 - 3600) % 3600) / 60
+                    WHEN `Clock-Out` IS NOT NULL AND (clock_out_s - clock_in_s) >= 0
+                        THEN ((clock_out_s - clock_in_s - 3600) % 3600) / 60
+                    WHEN `Clock-Out` IS NOT NULL
+                        THEN ((clock_out_s - clock_in_s + 86400 - 3600) % 3600) / 60
+                    ELSE 0
+                END
+            ) AS `Work Time`
+        FROM with_flags
+    ),
+
+    -- Overtime in seconds (Work Time minus Required Work Time), shared by OT1 and OT2
+    with_ot_seconds AS (
+        SELECT 
+            *,
+            strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`)) AS ot_s
+        FROM with_work_time
+    ),
+
+    final_with_ot AS (
+        SELECT 
+            *,
+            CASE 
+                WHEN `Clock-In` IS NOT NULL OR `Clock-Out` IS NOT NULL
+                THEN '00:00'
+                ELSE `Required Work Time`
+            END AS `Absent`,
+
+            CASE 
+                WHEN Workday IN ('Mon.', 'Tues.', 'Wed.', 'Thur.', 'Fri.')
+                     AND ot_s > 0
+                THEN printf('%02d:%02d',
+                    ot_s / 3600,
+                    (ot_s % 3600) / 60
+                )
+                ELSE '00:00'
+            END AS `OT1`,
+
+            CASE 
+                WHEN Workday IN ('Sat.', 'Sun.')
+                     AND ot_s > 0
+                THEN printf('%02d:%02d',
+                    ot_s / 3600,
+                    (ot_s % 3600) / 60
+                )
+                ELSE '00:00'
+            END AS `OT2`,
+
+            '00:00' AS `OT3`
+        FROM with_ot_seconds
+    )
+    SELECT 
+        employee_id,
+        full_name,
+        department,
+        Date,
+        Workday,
+        Timetable,
+        `Required Work Time`,
+        StartWorkTime,
+        EndWorkTime,
+        `Clock-In`,
+        `Clock-Out`,
+        `In`,
+        `Out`,
+        `Late Clock In`,
+        `Early Clock In`,
+        `Early Clock Out`,
+        `Break`,
+        `Work Time`,
+        `Absent`,
+        `OT1`,
+        `OT2`,
+        `OT3`
+    FROM final_with_ot
+    ORDER BY employee_id, Date;
+    """
+    
+    df = pd.read_sql_query(query, conn, params={'start_date': start_date, 'end_date': end_date, 'range_end': range_end})
+    
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No attendance data found for the specified date range")
+    
+    # Get company name for title
+    title_query = "SELECT cmp_name FROM hr_company LIMIT 1;"
+    company_row = conn.execute(title_query).fetchone()
+    company_name = company_row[0] if company_row else "Company Name"
+    
+    conn.close()
+    
+    # Generate Excel file using the same logic as saya.py
+    output_file = generate_excel_report(df, company_name, start_date, end_date)
+    
+    return output_file, end_date
+
 def generate_excel_report(df, company_name, start_date, end_date):
     """Generate Excel report using the same formatting logic as saya.py"""
     
@@ -801,469 +944,18 @@ def generate_excel_report(df, company_name, start_date, end_date):
     # Columns to sum
     sum_columns = ['Required Work Time', 'Work Time', 'Absent', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
 
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Attendance"
-
-    thin_border = Border(left=Side(style='thin'),
-                         right=Side(style='thin'),
-                         top=Side(style='thin'),
-                         bottom=Side(style='thin'))
-
-    # Create Tahoma font
-    tahoma_font = Font(name='Tahoma', size=10)
-    tahoma_bold_font = Font(name='Tahoma', size=10, bold=True)
-
-    # Create yellow fill for Sunday rows
-    yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+    # Unique temp file per report; the endpoint deletes it once the download is sent
+    fd, filename = tempfile.mkstemp(prefix="attendance_report_", suffix=".xlsx")
+    os.close(fd)
 
-    # Create light red fill for late clock-in cells
-    red_fill = PatternFill(start_color='FFCCCB', end_color='FFCCCB', fill_type='solid')
-
-    # Create light purple fill for penalty cells
-    light_purple_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-
-    # Create light orange fill for total base cells
-    light_orange_fill = PatternFill(start_color='FFE4B5', end_color='FFE4B5', fill_type='solid')
-
-    # Create bright red font for suspicious early clock in
-    bright_red_font = Font(name='Tahoma', size=10, color='FF0000')
-
-    # Create orange fill for suspicious punch pattern rows
-    orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
-
-    # Create green fill for total rows
-    green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
-
-    # Create light yellow fill for specific header columns
-    header_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-
-    # Create light orange fill for Total Base column
-    total_base_fill = PatternFill(start_color='FFCC99', end_color='FFCC99', fill_type='solid')
-
-    # Create light green fill for Total Day column
-    total_day_fill = PatternFill(start_color='E2EFDA', end_color='E2EFDA', fill_type='solid')
-
-    # Create light orange fill for Clock columns
-    clock_header_fill = PatternFill(start_color='FFE4B5', end_color='FFE4B5', fill_type='solid')
-
-    # Create light blue fill for OT columns
-    ot_header_fill = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')
-
-    # Create light purple fill for Penalty column
-    penalty_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
-
-    # Create title font
-    title_font = Font(name='Tahoma', size=22, bold=True)
-
-    # Create subtitle font
-    subtitle_font = Font(name='Tahoma', size=14, bold=True)
-
-    current_row = 1
-
-    # Add company name title at the top
-    ws.cell(row=current_row, column=1, value=company_name).font = title_font
-    current_row += 2  # Add 1 empty row of space after title
-
-    # Add subtitle with date range
-    ws.cell(row=current_row, column=1, value=f"Monthly Statement Report ({start_date} to {end_date})").font = subtitle_font
-    current_row += 1
-    
-    # Add note about expandable columns
-    note_font = Font(name='Tahoma', size=9, italic=True)
-    ws.cell(row=current_row, column=1, value="📍 Note: OT columns (OT1,OT2,OT3) and Leave columns (H,MC,AL,UP,S) are grouped. Click [+] buttons to expand.").font = note_font
-    current_row += 2  # Add 1 empty row of space after note
-
-    # Write column headers only once
+    # Columns shown in the report, in order
     cols_to_show = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent', 'Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
     # Define columns that need the special header color
     colored_header_columns = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent']
-    for col_idx, col_name in enumerate(cols_to_show, start=1):
-        header_cell = ws.cell(row=current_row, column=col_idx, value=col_name)
-        header_cell.font = tahoma_bold_font
-        header_cell.alignment = Alignment(wrap_text=True)
-        # Apply background color to specific columns
-        if col_name in colored_header_columns:
-            header_cell.fill = header_fill
-        elif col_name == 'Total Base':
-            header_cell.fill = total_base_fill
-        elif col_name in ['Total Day', 'Night Shift', 'Allowence']:
-            header_cell.fill = total_day_fill
-        elif col_name in ['Clock-In', 'Clock-Out', 'In', 'Out']:
-            header_cell.fill = clock_header_fill
-        elif col_name in ['OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F']:
-            header_cell.fill = ot_header_fill
-        elif col_name == 'Penalty':
-            header_cell.fill = penalty_fill
-    ws.row_dimensions[current_row].height = 39.75
-    current_row += 1
-
-    # Function to format time from HH:MM:SS to HH:MM
-    def format_time(time_str):
-        if not time_str or time_str == '':
-            return time_str
-        try:
-            # If time has seconds, remove them
-            if time_str.count(':') == 2:
-                parts = time_str.split(':')
-                return f"{parts[0]}:{parts[1]}"
-            else:
-                return time_str
-        except:
-            return time_str
-
-    for emp_id, group in df.groupby('employee_id'):
-        emp_info = group.iloc[0]
 
-        # Write employee info in single row format
-        ws.cell(row=current_row, column=1, value="Employee ID").font = tahoma_bold_font
-        ws.cell(row=current_row, column=2, value=emp_id).font = tahoma_font
-        ws.cell(row=current_row, column=3, value="Full Name").font = tahoma_bold_font
-        ws.cell(row=current_row, column=4, value=emp_info['full_name']).font = tahoma_font
-        ws.row_dimensions[current_row].height = 18
-        current_row += 1
+    # Add column grouping for expandable columns; grouped columns are written collapsed in <cols>
+    grouped_columns = []
 
-        # Write data rows
-        data_start_row = current_row  # Mark the start of data rows for grouping
-        for _, row in group.iterrows():
-            is_sunday = row.get('Workday') == 'Sun.'
-            
-            # Function to convert time string to minutes for comparison
-            def time_to_minutes(time_str):
-                if not time_str or time_str in ['', '0:00', '00:00']:
-                    return 0
-                try:
-                    parts = time_str.split(':')
-                    hours = int(parts[0])
-                    minutes = int(parts[1])
-                    return hours * 60 + minutes
-                except:
-                    return 0
-            
-            # Check if this is a suspicious row (Early Clock In > 2:30)
-            early_in_value = row.get('Early Clock In', "")
-            early_in_minutes = time_to_minutes(early_in_value)
-            is_suspicious_row = early_in_minutes > 150  # 2:30 = 150 minutes
-            
-            # Check for suspicious punch patterns
-            def has_value(val):
-                return val and val.strip() != ''
-            
-            clock_in = row.get('Clock-In', '')
-            clock_out = row.get('Clock-Out', '')
-            in_punch = row.get('In', '')
-            out_punch = row.get('Out', '')
-            
-            clock_in_exists = has_value(clock_in)
-            clock_out_exists = has_value(clock_out)
-            in_exists = has_value(in_punch)
-            out_exists = has_value(out_punch)
-            
-            # Determine if punch pattern is suspicious
-            is_punch_suspicious = False
-            if clock_in_exists and not clock_out_exists and not in_exists and not out_exists:
-                # Only Clock In exists = SUSPICIOUS
-                is_punch_suspicious = True
-            elif clock_in_exists and clock_out_exists and in_exists and not out_exists:
-                # Clock In + Clock Out + In (missing Out) = SUSPICIOUS
-                is_punch_suspicious = True
-            
-            for col_idx, col_name in enumerate(cols_to_show, start=1):
-                # Set value based on column name
-                if col_name == 'EYEE NAME':
-                    cell_value = emp_info['full_name']
-                elif col_name == 'Timetable':
-                    # Format as "Timetable (StartTime - EndTime)"
-                    timetable_name = row.get('Timetable', "")
-                    start_time = format_time(row.get('StartWorkTime', ""))
-                    end_time = format_time(row.get('EndWorkTime', ""))
-                    if timetable_name and start_time and end_time:
-                        cell_value = f"{timetable_name} ({start_time} - {end_time})"
-                    else:
-                        cell_value = timetable_name
-                elif col_name == 'Penalty':
-                    cell_value = '0.0'
-                elif col_name == 'Night Shift':
-                    # Check if original Timetable contains "NIGHT"
-                    original_timetable = row.get('Timetable', "")
-                    if 'NIGHT' in str(original_timetable).upper():
-                        cell_value = '2.0'
-                    else:
-                        cell_value = '0.0'
-                elif col_name == 'Allowence':
-                    cell_value = '0.0'
-                elif col_name == 'Total Base':
-                    # Set 1.0 for non-Sunday, 0.0 for Sunday
-                    if is_sunday:
-                        cell_value = '0.0'
-                    else:
-                        cell_value = '1.0'
-                elif col_name == 'Day':
-                    # Sunday is always empty, other days depend on clock-in/out presence
-                    if is_sunday:
-                        cell_value = ''
-                    else:
-                        # Check if worker was present (has clock-in OR clock-out)
-                        clock_in = row.get('Clock-In', '')
-                        clock_out = row.get('Clock-Out', '')
-                        if clock_in or clock_out:  # If either clock-in or clock-out has value
-                            cell_value = '1.0'
-                        else:
-                            cell_value = ''
-                elif col_name in ['H', 'MC', 'AL', 'UP', 'S']:
-                    # Leave these columns empty
-                    cell_value = ''
-                elif col_name == 'Total Day':
-                    # Fill every cell with 1.0
-                    cell_value = '1.0'
-                elif col_name in ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']:
-                    # Format time columns to show only HH:MM (remove seconds)
-                    cell_value = format_time(row.get(col_name, ""))
-                else:
-                    cell_value = row.get(col_name, "")
-                
-                # Convert OT time values to decimal format
-                if col_name in ['OT1', 'OT2', 'OT3'] and cell_value:
-                    # Convert "hh:mm" to decimal (e.g., "02:30" -> "2.5")
-                    def time_to_decimal(time_str):
-                        if not time_str or time_str in ['', '0:00', '00:00']:
-                            return '0.0'
-                        try:
-                            parts = time_str.split(':')
-                            hours = int(parts[0])
-                            minutes = int(parts[1])
-                            decimal_value = hours + (minutes / 60.0)
-                            return f"{decimal_value:.2f}".rstrip('0').rstrip('.')
-                        except:
-                            return cell_value
-                    
-                    cell_value = time_to_decimal(cell_value)
-                
-                # Handle OT-F columns (floored overtime values)
-                if col_name in ['OT1-F', 'OT2-F', 'OT3-F']:
-                    # For OT-F columns, get value from DataFrame, handle NaN and None cases
-                    val = row.get(col_name, '0.0')
-                    if pd.isna(val) or val is None or val == '' or str(val).lower() == 'nan':
-                        cell_value = '0.0'
-                    else:
-                        cell_value = str(val)
-                
-                cell = ws.cell(row=current_row, column=col_idx, value=cell_value)
-                
-                # Apply font styling based on suspicious row detection
-                if is_suspicious_row and col_name in ['Timetable', 'StartWorkTime', 'EndWorkTime', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Night Shift']:
-                    cell.font = bright_red_font  # Apply bright red font for suspicious rows
-                else:
-                    cell.font = tahoma_font  # Apply regular font to data cells
-                
-                # Apply cell coloring based on conditions (punch suspicious takes priority)
-                if is_punch_suspicious:
-                    # Apply orange background to entire row for suspicious punch patterns
-                    cell.fill = orange_fill
-                elif col_name == 'Late Clock In':
-                    # Check if this is a late clock-in cell with a value other than 0:00
-                    late_value = row.get(col_name, "")
-                    if late_value and late_value not in ['0:00', '00:00', '']:
-                        cell.fill = red_fill
-                    elif is_sunday:
-                        cell.fill = yellow_fill
-                elif col_name == 'Early Clock In':
-                    # Apply Sunday background if applicable
-                    if is_sunday:
-                        cell.fill = yellow_fill
-                elif col_name == 'Early Clock Out':
-                    # Check if this is an early clock-out cell with a value other than 0:00
-                    early_out_value = row.get(col_name, "")
-                    if early_out_value and early_out_value not in ['0:00', '00:00', '']:
-                        cell.fill = red_fill  # Light red even on Sunday
-                    elif is_sunday:
-                        cell.fill = yellow_fill
-                elif col_name == 'Penalty':
-                    # Check if this is a penalty cell
-                    if is_sunday:
-                        cell.fill = yellow_fill
-                    elif cell_value and cell_value != '':
-                        # Apply light purple color to all non-empty, non-Sunday cells
-                        cell.fill = penalty_fill
-                elif col_name == 'Total Base':
-                    # Check if this is a total base cell
-                    if is_sunday:
-                        cell.fill = yellow_fill
-                    elif cell_value and cell_value != '':
-                        # Apply new orange color to all non-empty, non-Sunday cells
-                        cell.fill = total_base_fill
-                elif col_name == 'Total Day':
-                    # Check if this is a total day cell
-                    if is_sunday:
-                        cell.fill = yellow_fill
-                    elif cell_value and cell_value != '':
-                        # Apply light green color to all non-empty, non-Sunday cells
-                        cell.fill = total_day_fill
-                elif col_name in ['Night Shift', 'Allowence']:
-                    # Check if this is a night shift or allowence cell
-                    if is_sunday:
-                        cell.fill = yellow_fill
-                    elif cell_value and cell_value != '':
-                        # Apply light green color to all non-empty, non-Sunday cells
-                        cell.fill = total_day_fill
-                elif is_sunday:
-                    cell.fill = yellow_fill
-            ws.row_dimensions[current_row].height = 18
-            # Set outline level for data rows (level 1 for grouping)
-            ws.row_dimensions[current_row].outline_level = 1
-            current_row += 1
-
-        # Add TOTAL row for each employee
-        def time_to_minutes_for_sum(time_str):
-            """Convert HH:MM time string to minutes for summing"""
-            if not time_str or time_str in ['', '0:00', '00:00']:
-                return 0
-            try:
-                parts = str(time_str).split(':')
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                return hours * 60 + minutes
-            except:
-                return 0
-        
-        def minutes_to_time_str(total_minutes):
-            """Convert total minutes back to HH:MM format"""
-            if total_minutes == 0:
-                return '00:00'
-            hours = total_minutes // 60
-            minutes = total_minutes % 60
-            return f"{hours:02d}:{minutes:02d}"
-        
-        def sum_decimal_values(group, col_name):
-            """Sum decimal values from a column"""
-            total = 0.0
-            has_values = False
-            
-            for _, row in group.iterrows():
-                val = row.get(col_name, '')
-                
-                if val and str(val).strip() not in ['', '0.0', 'nan', 'None', 'NaN']:
-                    try:
-                        # Handle different data formats
-                        val_str = str(val).strip()
-                        
-                        # Special handling for certain column types
-                        if col_name in ['OT1', 'OT2', 'OT3']:
-                            # These might be in decimal format already (e.g., "2.5") or time format (e.g., "02:30")
-                            if ':' in val_str:
-                                # Convert time format to decimal hours
-                                parts = val_str.split(':')
-                                hours = int(parts[0])
-                                minutes = int(parts[1])
-                                numeric_val = hours + (minutes / 60.0)
-                            else:
-                                numeric_val = float(val_str)
-                        else:
-                            # Standard decimal conversion
-                            numeric_val = float(val_str)
-                        
-                        total += numeric_val
-                        if numeric_val != 0.0:
-                            has_values = True
-                            
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Return the total if there are any values, otherwise return "0.0" for columns that should show totals
-            if has_values or total > 0:
-                return f"{total:.1f}"
-            else:
-                # For certain columns, always show 0.0 even if no values
-                always_show_zero = ['Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'Total Day']
-                return "0.0" if col_name in always_show_zero else ""
-        
-        # Calculate totals for time-based columns
-        time_columns = ['Required Work Time', 'Work Time', 'Absent', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Break']
-        decimal_columns = ['Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
-        
-        # Columns that should show count of non-empty records
-        count_columns = ['Workday', 'Timetable']
-        
-        # Columns that should remain empty in totals
-        empty_columns = ['EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']
-        
-        # Write TOTAL row
-        for col_idx, col_name in enumerate(cols_to_show, start=1):
-            if col_name == 'Date':
-                cell_value = 'TOTAL'
-            elif col_name in time_columns:
-                # Sum time values
-                total_minutes = 0
-                for _, row in group.iterrows():
-                    total_minutes += time_to_minutes_for_sum(row.get(col_name, ''))
-                cell_value = minutes_to_time_str(total_minutes)
-            elif col_name in decimal_columns:
-                # Sum decimal values
-                cell_value = sum_decimal_values(group, col_name)
-            elif col_name in count_columns:
-                # Count non-empty values
-                count = 0
-                for _, row in group.iterrows():
-                    val = row.get(col_name, '')
-                    if val and str(val).strip() != '':
-                        count += 1
-                cell_value = str(count) if count > 0 else ''
-            elif col_name in empty_columns:
-                # Leave these columns empty in total row
-                cell_value = ''
-            else:
-                # For any remaining columns, try to sum if they contain numeric/time data
-                # First try as decimal
-                try:
-                    total_decimal = 0.0
-                    has_values = False
-                    for _, row in group.iterrows():
-                        val = row.get(col_name, '')
-                        if val and str(val).strip() not in ['', '0.0', 'nan']:
-                            try:
-                                total_decimal += float(val)
-                                has_values = True
-                            except:
-                                pass
-                    if has_values:
-                        cell_value = f"{total_decimal:.1f}" if total_decimal > 0 else "0.0"
-                    else:
-                        # Try as time format
-                        total_minutes = 0
-                        has_time_values = False
-                        for _, row in group.iterrows():
-                            val = row.get(col_name, '')
-                            if val and str(val).strip() not in ['', '00:00', '0:00']:
-                                minutes = time_to_minutes_for_sum(val)
-                                if minutes > 0:
-                                    total_minutes += minutes
-                                    has_time_values = True
-                        cell_value = minutes_to_time_str(total_minutes) if has_time_values else ''
-                except:
-                    cell_value = ''
-            
-            cell = ws.cell(row=current_row, column=col_idx, value=cell_value)
-            cell.font = tahoma_bold_font
-            cell.fill = green_fill  # Green background for total rows
-            cell.border = thin_border
-        
-        ws.row_dimensions[current_row].height = 18
-        current_row += 1
-
-        # Add one empty row after each employee
-        current_row += 1
-
-    # Apply border to all cells with data (excluding title rows)
-    for row in ws.iter_rows(min_row=5, max_row=ws.max_row, min_col=1, max_col=len(cols_to_show)):
-        for cell in row:
-            cell.border = thin_border
-
-    # Freeze panes to keep header rows visible when scrolling
-    # Freeze at the row right after the column headers (row 6)
-    ws.freeze_panes = 'A6'
-
-    # Add column grouping for expandable columns
     # Find the column indices for OT1, OT2, OT3
     ot1_col_idx = None
     ot2_col_idx = None
@@ -1299,12 +991,8 @@ def generate_excel_report(df, company_name, start_date, end_date):
         start_col = min(ot1_col_idx, ot2_col_idx, ot3_col_idx)
         end_col = max(ot1_col_idx, ot2_col_idx, ot3_col_idx)
         
-        # Set outline level for the OT columns (level 1 for grouping)
-        for col_num in range(start_col, end_col + 1):
-            col_letter = ws.cell(row=1, column=col_num).column_letter
-            ws.column_dimensions[col_letter].outline_level = 1
-            # Set columns to be hidden by default (collapsed state)
-            ws.column_dimensions[col_letter].hidden = True
+        # Outline level 1 for the OT columns, hidden by default (collapsed state)
+        grouped_columns.extend(range(start_col, end_col + 1))
         
         print(f"DEBUG: Grouped OT columns {start_col} to {end_col} for expand/collapse functionality")
     
@@ -1314,26 +1002,321 @@ def generate_excel_report(df, company_name, start_date, end_date):
         start_col = min(leave_columns)
         end_col = max(leave_columns)
         
-        # Set outline level for the leave columns (level 1 for grouping)
-        for col_num in range(start_col, end_col + 1):
-            col_letter = ws.cell(row=1, column=col_num).column_letter
-            ws.column_dimensions[col_letter].outline_level = 1
-            # Set columns to be hidden by default (collapsed state)
-            ws.column_dimensions[col_letter].hidden = True
+        # Outline level 1 for the leave columns, hidden by default (collapsed state)
+        grouped_columns.extend(range(start_col, end_col + 1))
         
         print(f"DEBUG: Grouped Leave columns (H,MC,AL,UP,S) {start_col} to {end_col} for expand/collapse functionality")
 
-    # Set outline groups to be collapsed by default
-    # Hide all data rows (outline level 1) by default to show collapsed view
-    for row_num in range(1, ws.max_row + 1):
-        if row_num in ws.row_dimensions:
-            if hasattr(ws.row_dimensions[row_num], 'outline_level') and ws.row_dimensions[row_num].outline_level == 1:
-                ws.row_dimensions[row_num].hidden = True
+    # Format time columns from HH:MM:SS to HH:MM once for the whole frame instead of per cell
+    for col in ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']:
+        if col in df.columns:
+            times = df[col].astype(object)
+            parts = times.str.split(':')
+            df[col] = times.where(times.str.count(':') != 2, parts.str[0] + ':' + parts.str[1])
+
+    # Suspicious-row flags for the whole frame instead of per row
+    # Early Clock In > 2:30 (150 minutes) turns the row's time columns red
+    early_in_parts = df['Early Clock In'].astype(object).str.extract(r'^\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*(?::|$)')
+    early_in_minutes = (early_in_parts[0].astype(float) * 60 + early_in_parts[1].astype(float)).fillna(0)
+    df['is_suspicious_early'] = early_in_minutes > 150
+    # Only Clock In, or Clock In + Clock Out + In with Out missing, turns the whole row orange
+    clock_in_exists, clock_out_exists, in_exists, out_exists = (
+        df[col].astype(object).str.strip().fillna('') != '' for col in ['Clock-In', 'Clock-Out', 'In', 'Out'])
+    df['is_suspicious_punch'] = ((clock_in_exists & ~clock_out_exists & ~in_exists & ~out_exists)
+                                 | (clock_in_exists & clock_out_exists & in_exists & ~out_exists))
+
+    # Every cell from the row above the headers down is bordered, including blank ones
+    blank_row = [None] * len(cols_to_show)
+    blank_styles = [BLANK_STYLE] * len(cols_to_show)
+
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        zf.writestr('_rels/.rels', ROOT_RELS_XML)
+        zf.writestr('xl/workbook.xml', WORKBOOK_XML)
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+        zf.writestr('xl/styles.xml', STYLES_XML)
+
+        # Stream the sheet XML into the archive as rows are built
+        with io.TextIOWrapper(zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True), encoding='utf-8') as sheet:
+            sheet.write(SHEET_HEAD_XML + SHEET_VIEW_XML)
+            if grouped_columns:
+                sheet.write('<cols>' + ''.join(f'<col min="{col_num}" max="{col_num}" width="13" customWidth="1" hidden="1" outlineLevel="1"/>' for col_num in grouped_columns) + '</cols>')
+            sheet.write('<sheetData>')
+            current_row = 1
+
+            # Add company name title at the top
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, [company_name], [TITLE_STYLE]))
+            current_row += 2  # Add 1 empty row of space after title
+
+            # Add subtitle with date range
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, [f"Monthly Statement Report ({start_date} to {end_date})"], [SUBTITLE_STYLE]))
+            current_row += 1
+
+            # Add note about expandable columns
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, ["📍 Note: OT columns (OT1,OT2,OT3) and Leave columns (H,MC,AL,UP,S) are grouped. Click [+] buttons to expand."], [NOTE_STYLE]))
+            current_row += 2  # Add 1 empty row of space after note
+
+            # Empty row above the headers
+            sheet.write(xml_row(COLUMN_LETTERS, current_row - 1, blank_row, blank_styles))
+
+            # Write column headers only once
+            header_styles = []
+            for col_idx, col_name in enumerate(cols_to_show, start=1):
+                # Apply background color to specific columns
+                if col_name in colored_header_columns:
+                    header_styles.append(HEADER_STYLE)
+                elif col_name == 'Total Base':
+                    header_styles.append(HEADER_TOTAL_BASE_STYLE)
+                elif col_name in ['Total Day', 'Night Shift', 'Allowence']:
+                    header_styles.append(HEADER_TOTAL_DAY_STYLE)
+                elif col_name in ['Clock-In', 'Clock-Out', 'In', 'Out']:
+                    header_styles.append(HEADER_CLOCK_STYLE)
+                elif col_name in ['OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F']:
+                    header_styles.append(HEADER_OT_STYLE)
+                elif col_name == 'Penalty':
+                    header_styles.append(HEADER_PENALTY_STYLE)
+                else:
+                    header_styles.append(HEADER_PLAIN_STYLE)
+            sheet.write(xml_row(COLUMN_LETTERS, current_row, cols_to_show, header_styles, height=39.75))
+            current_row += 1
+
+            # Per-column styling decided once: fill rule, red font on suspicious rows, late/early highlight
+            col_kind = [(STYLE_RULES.get(col_name),
+                         col_name in ['Timetable', 'StartWorkTime', 'EndWorkTime', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Night Shift'],
+                         col_name in ['Late Clock In', 'Early Clock Out'])
+                        for col_name in cols_to_show]
+
+            for emp_index, (emp_id, group) in enumerate(df.groupby('employee_id')):
+                emp_info = group.iloc[0]
+
+                # Empty row left after the previous employee
+                if emp_index > 0:
+                    sheet.write(xml_row(COLUMN_LETTERS, current_row - 1, blank_row, blank_styles))
+
+                # Write employee info in single row format
+                info_values = ["Employee ID", emp_id, "Full Name", emp_info['full_name']] + blank_row[4:]
+                info_styles = [LABEL_STYLE, DATA_STYLES[(False, None)], LABEL_STYLE, DATA_STYLES[(False, None)]] + blank_styles[4:]
+                sheet.write(xml_row(COLUMN_LETTERS, current_row, info_values, info_styles, height=18))
+                current_row += 1
+
+                # Write data rows
+                data_start_row = current_row  # Mark the start of data rows for grouping
+                # Plain dict rows keep row.get() lookups without building a Series per row
+                for row in group.to_dict('records'):
+                    is_sunday = row.get('Workday') == 'Sun.'
+                    
+                    # Suspicious-row flags are precomputed for the whole frame
+                    is_suspicious_row = row['is_suspicious_early']  # Early Clock In > 2:30
+                    is_punch_suspicious = row['is_suspicious_punch']  # Only Clock In, or Clock In + Clock Out + In missing Out
+                    
+                    row_values = []
+                    row_styles = []
+                    for col_name, (fill_rule, suspicious_col, late_early_col) in zip(cols_to_show, col_kind):
+                        # Set value based on column name
+                        if col_name == 'EYEE NAME':
+                            cell_value = emp_info['full_name']
+                        elif col_name == 'Timetable':
+                            # Format as "Timetable (StartTime - EndTime)"
+                            timetable_name = row.get('Timetable', "")
+                            start_time = row.get('StartWorkTime', "")
+                            end_time = row.get('EndWorkTime', "")
+                            if timetable_name and start_time and end_time:
+                                cell_value = f"{timetable_name} ({start_time} - {end_time})"
+                            else:
+                                cell_value = timetable_name
+                        elif col_name == 'Penalty':
+                            cell_value = '0.0'
+                        elif col_name == 'Night Shift':
+                            # Check if original Timetable contains "NIGHT"
+                            original_timetable = row.get('Timetable', "")
+                            if 'NIGHT' in str(original_timetable).upper():
+                                cell_value = '2.0'
+                            else:
+                                cell_value = '0.0'
+                        elif col_name == 'Allowence':
+                            cell_value = '0.0'
+                        elif col_name == 'Total Base':
+                            # Set 1.0 for non-Sunday, 0.0 for Sunday
+                            if is_sunday:
+                                cell_value = '0.0'
+                            else:
+                                cell_value = '1.0'
+                        elif col_name == 'Day':
+                            # Sunday is always empty, other days depend on clock-in/out presence
+                            if is_sunday:
+                                cell_value = ''
+                            else:
+                                # Check if worker was present (has clock-in OR clock-out)
+                                clock_in = row.get('Clock-In', '')
+                                clock_out = row.get('Clock-Out', '')
+                                if clock_in or clock_out:  # If either clock-in or clock-out has value
+                                    cell_value = '1.0'
+                                else:
+                                    cell_value = ''
+                        elif col_name in ['H', 'MC', 'AL', 'UP', 'S']:
+                            # Leave these columns empty
+                            cell_value = ''
+                        elif col_name == 'Total Day':
+                            # Fill every cell with 1.0
+                            cell_value = '1.0'
+                        else:
+                            cell_value = row.get(col_name, "")
+                        
+                        # Convert OT time values to decimal format
+                        if col_name in ['OT1', 'OT2', 'OT3'] and cell_value:
+                            # Convert "hh:mm" to decimal (e.g., "02:30" -> "2.5")
+                            def time_to_decimal(time_str):
+                                if not time_str or time_str in ['', '0:00', '00:00']:
+                                    return '0.0'
+                                try:
+                                    parts = time_str.split(':')
+                                    hours = int(parts[0])
+                                    minutes = int(parts[1])
+                                    decimal_value = hours + (minutes / 60.0)
+                                    return format_decimal_hours(decimal_value)
+                                except:
+                                    return cell_value
+                            
+                            cell_value = time_to_decimal(cell_value)
+                        
+                        # Handle OT-F columns (floored overtime values)
+                        if col_name in ['OT1-F', 'OT2-F', 'OT3-F']:
+                            # For OT-F columns, get value from DataFrame, handle NaN and None cases
+                            val = row.get(col_name, '0.0')
+                            if pd.isna(val) or val is None or val == '' or str(val).lower() == 'nan':
+                                cell_value = '0.0'
+                            else:
+                                cell_value = str(val)
+                        
+                        # Apply font styling based on suspicious row detection
+                        red_font = is_suspicious_row and suspicious_col
+                        
+                        # Apply cell coloring based on conditions (punch suspicious takes priority)
+                        late_early_value = row.get(col_name, "") if late_early_col else ""
+                        fill = None
+                        if is_punch_suspicious:
+                            # Apply orange background to entire row for suspicious punch patterns
+                            fill = 'orange'
+                        elif late_early_value and late_early_value not in ['0:00', '00:00', '']:
+                            # Late clock-in / early clock-out with a value other than 0:00 is light red even on Sunday
+                            fill = 'red'
+                        elif is_sunday:
+                            fill = 'yellow'
+                        elif fill_rule and cell_value:
+                            # Penalty, Total Base, Total Day, Night Shift and Allowence columns get their own color
+                            fill = fill_rule
+                        
+                        row_values.append(cell_value)
+                        row_styles.append(DATA_STYLES[(red_font, fill)])
+                    # Set outline level for data rows (level 1 for grouping), collapsed by default
+                    sheet.write(xml_row(COLUMN_LETTERS, current_row, row_values, row_styles, height=18, collapsed=True))
+                    current_row += 1
+
+                # Add TOTAL row for each employee
+                def time_to_minutes_for_sum(values):
+                    """Convert a column of HH:MM time strings to minutes for summing; blank or unparseable values count as 0"""
+                    parts = values.astype(str).str.extract(r'^\s*([+-]?[0-9]+)\s*:\s*([+-]?[0-9]+)\s*(?::|$)')
+                    hours = pd.to_numeric(parts[0], errors='coerce')
+                    minutes = pd.to_numeric(parts[1], errors='coerce')
+                    return (hours * 60 + minutes).fillna(0)
+                
+                def minutes_to_time_str(total_minutes):
+                    """Convert total minutes back to HH:MM format"""
+                    if total_minutes == 0:
+                        return '00:00'
+                    hours = total_minutes // 60
+                    minutes = total_minutes % 60
+                    return f"{hours:02d}:{minutes:02d}"
+                
+                def sum_decimal_values(group, col_name):
+                    """Sum decimal values from a column"""
+                    values = group[col_name]
+                    val_str = values.astype(str).str.strip()
+                    usable = values.astype(bool) & ~val_str.isin(['', '0.0', 'nan', 'None', 'NaN'])
+                    
+                    # Standard decimal conversion; entries that don't parse are skipped
+                    numeric_vals = pd.to_numeric(val_str.where(usable), errors='coerce').astype(float)
+                    
+                    # Special handling for certain column types
+                    if col_name in ['OT1', 'OT2', 'OT3']:
+                        # These might be in decimal format already (e.g., "2.5") or time format (e.g., "02:30")
+                        parts = val_str.where(usable).str.extract(r'^\s*([+-]?[0-9]+)\s*:\s*([+-]?[0-9]+)\s*(?::|$)')
+                        time_vals = pd.to_numeric(parts[0], errors='coerce') + (pd.to_numeric(parts[1], errors='coerce') / 60.0)
+                        numeric_vals = time_vals.where(val_str.str.contains(':', regex=False), numeric_vals)
+                    
+                    numeric_vals = numeric_vals.dropna()
+                    total = sum(numeric_vals.tolist())  # Added left to right, as the per-row loop did, so rounding is unchanged
+                    has_values = bool((numeric_vals != 0.0).any())
+                    
+                    # Return the total if there are any values, otherwise return "0.0" for columns that should show totals
+                    if has_values or total > 0:
+                        return f"{total:.1f}"
+                    else:
+                        # For certain columns, always show 0.0 even if no values
+                        always_show_zero = ['Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'Total Day']
+                        return "0.0" if col_name in always_show_zero else ""
+                
+                # Calculate totals for time-based columns
+                time_columns = ['Required Work Time', 'Work Time', 'Absent', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Break']
+                decimal_columns = ['Penalty', 'OT1', 'OT2', 'OT3', 'OT1-F', 'OT2-F', 'OT3-F', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
+                
+                # Columns that should show count of non-empty records
+                count_columns = ['Workday', 'Timetable']
+                
+                # Columns that should remain empty in totals
+                empty_columns = ['EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']
+                
+                # Write TOTAL row
+                total_values = []
+                for col_idx, col_name in enumerate(cols_to_show, start=1):
+                    if col_name == 'Date':
+                        cell_value = 'TOTAL'
+                    elif col_name in time_columns:
+                        # Sum time values
+                        total_minutes = int(time_to_minutes_for_sum(group[col_name]).sum())
+                        cell_value = minutes_to_time_str(total_minutes)
+                    elif col_name in decimal_columns:
+                        # Sum decimal values
+                        cell_value = sum_decimal_values(group, col_name)
+                    elif col_name in count_columns:
+                        # Count non-empty values
+                        values = group[col_name]
+                        count = int((values.astype(bool) & (values.astype(str).str.strip() != '')).sum())
+                        cell_value = str(count) if count > 0 else ''
+                    elif col_name in empty_columns:
+                        # Leave these columns empty in total row
+                        cell_value = ''
+                    else:
+                        # For any remaining columns, try to sum if they contain numeric/time data
+                        # First try as decimal
+                        try:
+                            values = group[col_name]
+                            val_str = values.astype(str).str.strip()
+                            decimal_vals = pd.to_numeric(val_str.where(values.astype(bool) & ~val_str.isin(['', '0.0', 'nan'])), errors='coerce').astype(float).dropna()
+                            has_values = not decimal_vals.empty
+                            if has_values:
+                                total_decimal = sum(decimal_vals.tolist())
+                                cell_value = f"{total_decimal:.1f}" if total_decimal > 0 else "0.0"
+                            else:
+                                # Try as time format
+                                minutes = time_to_minutes_for_sum(values.where(values.astype(bool) & ~val_str.isin(['', '00:00', '0:00'])))
+                                minutes = minutes[minutes > 0]
+                                total_minutes = int(minutes.sum())
+                                has_time_values = not minutes.empty
+                                cell_value = minutes_to_time_str(total_minutes) if has_time_values else ''
+                        except:
+                            cell_value = ''
+                    
+                    total_values.append(cell_value)
+                
+                # Green background for total rows
+                sheet.write(xml_row(COLUMN_LETTERS, current_row, total_values, [TOTAL_STYLE] * len(total_values), height=18))
+                current_row += 1
+
+                # Add one empty row after each employee
+                current_row += 1
 
-    # Save Excel file with random number
-    random_num = random.randint(1000, 9999)
-    filename = f"attendance_report_{random_num}.xlsx"
-    wb.save(filename)
+            sheet.write(SHEET_TAIL_XML)
     
     return filename
 
@@ -1,8 +1,8 @@
 import sqlite3
 import pandas as pd
-import random
-from openpyxl import Workbook
-from openpyxl.styles import Border, Side, Font, PatternFill, Alignment
+import tempfile
+import os
+import xlsxwriter
 # Connect to your SQLite DB
 conn = sqlite3.connect('ZK.db')  # Change this to your DB path
 
@@ -57,40 +57,53 @@ final AS (
     GROUP BY e.emp_pin, e.emp_firstname, e.emp_lastname, d.dept_name, r.punch_date, tt.timetable_name, tt.timetable_start, tt.timetable_end
 ),
 
+-- Seconds since midnight for each time column, parsed once and reused by the flag and work time arithmetic
+with_seconds AS (
+    SELECT 
+        *,
+        strftime('%s', time(`Clock-In`)) % 86400 AS clock_in_s,
+        strftime('%s', time(`Clock-Out`)) % 86400 AS clock_out_s,
+        strftime('%s', time(`In`)) % 86400 AS in_s,
+        strftime('%s', time(`Out`)) % 86400 AS out_s,
+        strftime('%s', time(StartWorkTime)) % 86400 AS start_s,
+        strftime('%s', time(EndWorkTime)) % 86400 AS end_s
+    FROM final
+),
+
 with_flags AS (
     SELECT 
         *,
         -- Late Clock In
         CASE 
-            WHEN time(`Clock-In`) > time(StartWorkTime)
+            WHEN clock_in_s > start_s
             THEN printf('%02d:%02d', 
-                (strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) / 3600,
-                ((strftime('%s', time(`Clock-In`)) - strftime('%s', time(StartWorkTime))) % 3600) / 60
+                (clock_in_s - start_s) / 3600,
+                ((clock_in_s - start_s) % 3600) / 60
             )
             ELSE '00:00'
         END AS `Late Clock In`,
 
         -- Early Clock In
         CASE 
-            WHEN time(`Clock-In`) < time(StartWorkTime)
+            WHEN clock_in_s < start_s
             THEN printf('%02d:%02d', 
-                (strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) / 3600,
-                ((strftime('%s', time(StartWorkTime)) - strftime('%s', time(`Clock-In`))) % 3600) / 60
+                (start_s - clock_in_s) / 3600,
+                ((start_s - clock_in_s) % 3600) / 60
             )
             ELSE '00:00'
         END AS `Early Clock In`,
 
         -- Early Clock Out: Use `Out` first, fallback to `Clock-Out`
         CASE 
-            WHEN (`Out` IS NOT NULL AND time(`Out`) < time(EndWorkTime))
+            WHEN (`Out` IS NOT NULL AND out_s < end_s)
             THEN printf('%02d:%02d', 
-                (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) / 3600,
-                ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Out`))) % 3600) / 60
+                (end_s - out_s) / 3600,
+                ((end_s - out_s) % 3600) / 60
             )
-            WHEN (`Out` IS NULL AND `Clock-Out` IS NOT NULL AND time(`Clock-Out`) < time(EndWorkTime))
+            WHEN (`Out` IS NULL AND `Clock-Out` IS NOT NULL AND clock_out_s < end_s)
             THEN printf('%02d:%02d', 
-                (strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) / 3600,
-                ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
+                (end_s - clock_out_s) / 3600,
+                ((end_s - clock_out_s) % 3600) / 60
             )
             ELSE '00:00'
         END AS `Early Clock Out`,
@@ -98,21 +111,21 @@ with_flags AS (
         -- Break
         printf('%02d:%02d',
             CASE
-                WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                    THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)))
+                WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (in_s - clock_out_s) >= 0
+                    THEN (in_s - clock_out_s)
                 WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                    THEN (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400)
+                    THEN (in_s - clock_out_s + 86400)
                 ELSE 0
             END / 3600,
             CASE
-                WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) >= 0
-                    THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`))) % 3600) / 60
+                WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND (in_s - clock_out_s) >= 0
+                    THEN ((in_s - clock_out_s) % 3600) / 60
                 WHEN `In` IS NOT NULL AND `Clock-Out` IS NOT NULL
-                    THEN ((strftime('%s', time(`In`)) - strftime('%s', time(`Clock-Out`)) + 86400) % 3600) / 60
+                    THEN ((in_s - clock_out_s + 86400) % 3600) / 60
                 ELSE 0
             END
         ) AS `Break`
-    FROM final
+    FROM with_seconds
 ),
 
 with_work_time AS (
@@ -121,45 +134,53 @@ with_work_time AS (
         -- Required Work Time
         printf('%02d:%02d',
             CASE 
-                WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                THEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600)
-                ELSE (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600)
+                WHEN (end_s - start_s) >= 0 
+                THEN (end_s - start_s - 3600)
+                ELSE (end_s - start_s + 86400 - 3600)
             END / 3600,
             CASE 
-                WHEN (strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime))) >= 0 
-                THEN ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) - 3600) % 3600) / 60
-                ELSE ((strftime('%s', time(EndWorkTime)) - strftime('%s', time(StartWorkTime)) + 86400 - 3600) % 3600) / 60
+                WHEN (end_s - start_s) >= 0 
+                THEN ((end_s - start_s - 3600) % 3600) / 60
+                ELSE ((end_s - start_s + 86400 - 3600) % 3600) / 60
             END
         ) AS `Required Work Time`,
 
         -- Work Time
         printf('%02d:%02d',
             CASE
-                WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                    THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
+                WHEN `Out` IS NOT NULL AND (out_s - clock_in_s) >= 0
+                    THEN (out_s - clock_in_s - 3600)
                 WHEN `Out` IS NOT NULL
-                    THEN (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
-                WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                    THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600)
+                    THEN (out_s - clock_in_s + 86400 - 3600)
+                WHEN `Clock-Out` IS NOT NULL AND (clock_out_s - clock_in_s) >= 0
+                    THEN (clock_out_s - clock_in_s - 3600)
                 WHEN `Clock-Out` IS NOT NULL
-                    THEN (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600)
+                    THEN (clock_out_s - clock_in_s + 86400 - 3600)
                 ELSE 0
             END / 3600,
             CASE
-                WHEN `Out` IS NOT NULL AND (strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                    THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
+                WHEN `Out` IS NOT NULL AND (out_s - clock_in_s) >= 0
+                    THEN ((out_s - clock_in_s - 3600) % 3600) / 60
                 WHEN `Out` IS NOT NULL
-                    THEN ((strftime('%s', time(`Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
-                WHEN `Clock-Out` IS NOT NULL AND (strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`))) >= 0
-                    THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) - 3600) % 3600) / 60
+                    THEN ((out_s - clock_in_s + 86400 - 3600) % 3600) / 60
+                WHEN `Clock-Out` IS NOT NULL AND (clock_out_s - clock_in_s) >= 0
+                    THEN ((clock_out_s - clock_in_s - 3600) % 3600) / 60
                 WHEN `Clock-Out` IS NOT NULL
-                    THEN ((strftime('%s', time(`Clock-Out`)) - strftime('%s', time(`Clock-In`)) + 86400 - 3600) % 3600) / 60
+                    THEN ((clock_out_s - clock_in_s + 86400 - 3600) % 3600) / 60
                 ELSE 0
             END
         ) AS `Work Time`
     FROM with_flags
 ),
 
+-- Overtime in seconds (Work Time minus Required Work Time), shared by OT1 and OT2
+with_ot_seconds AS (
+    SELECT 
+        *,
+        strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`)) AS ot_s
+    FROM with_work_time
+),
+
 final_with_ot AS (
     SELECT 
         *,
@@ -171,26 +192,26 @@ final_with_ot AS (
 
         CASE 
             WHEN Workday IN ('Mon.', 'Tues.', 'Wed.', 'Thur.', 'Fri.')
-                 AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
+                 AND ot_s > 0
             THEN printf('%02d:%02d',
-                (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
+                ot_s / 3600,
+                (ot_s % 3600) / 60
             )
             ELSE '00:00'
         END AS `OT1`,
 
         CASE 
             WHEN Workday IN ('Sat.', 'Sun.')
-                 AND (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) > 0
+                 AND ot_s > 0
             THEN printf('%02d:%02d',
-                (strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) / 3600,
-                ((strftime('%s', time(`Work Time`)) - strftime('%s', time(`Required Work Time`))) % 3600) / 60
+                ot_s / 3600,
+                (ot_s % 3600) / 60
             )
             ELSE '00:00'
         END AS `OT2`,
 
         '00:00' AS `OT3`
-    FROM with_work_time
+    FROM with_ot_seconds
 )
 SELECT 
     employee_id,
@@ -214,7 +235,14 @@ SELECT
     `Absent`,
     `OT1`,
     `OT2`,
-    `OT3`
+    `OT3`,
+    -- Row flags used for highlighting
+    CAST(substr(`Early Clock In`, 1, 2) AS INTEGER) * 60 + CAST(substr(`Early Clock In`, 4, 2) AS INTEGER) > 150 AS is_suspicious_early,
+    CASE 
+        WHEN `Clock-In` IS NOT NULL AND `Clock-Out` IS NULL AND `In` IS NULL AND `Out` IS NULL THEN 1  -- Only Clock In
+        WHEN `Clock-In` IS NOT NULL AND `Clock-Out` IS NOT NULL AND `In` IS NOT NULL AND `Out` IS NULL THEN 1  -- Missing Out
+        ELSE 0
+    END AS is_suspicious_punch
 FROM final_with_ot
 ORDER BY employee_id, Date;
 
@@ -223,186 +251,233 @@ df = pd.read_sql_query(query, conn)
 
 # Get company name for title
 title_query = "SELECT cmp_name FROM hr_company LIMIT 1;"
-title_df = pd.read_sql_query(title_query, conn)
-company_name = title_df.iloc[0]['cmp_name'] if not title_df.empty else "Company Name"
+company_row = conn.execute(title_query).fetchone()
+company_name = company_row[0] if company_row else "Company Name"
 
 conn.close()
 
-# Columns to sum
-sum_columns = ['Required Work Time', 'Work Time', 'Absent', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Penalty', 'OT1', 'OT2', 'OT3', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
-
-# Create workbook
-wb = Workbook()
-ws = wb.active
-ws.title = "Attendance"
-
-thin_border = Border(left=Side(style='thin'),
-                     right=Side(style='thin'),
-                     top=Side(style='thin'),
-                     bottom=Side(style='thin'))
+# Convert an OT "hh:mm" value to decimal hours for the TOTAL row; blank or unparseable values count as 0
+def time_to_decimal_total(ot_value):
+    if not isinstance(ot_value, str) or ot_value in ['', '0:00', '00:00']:
+        return 0.0
+    hours, sep, rest = ot_value.partition(':')
+    minutes = rest.partition(':')[0]
+    if not sep or not hours.isdecimal() or not minutes.isdecimal():
+        return 0.0
+    return int(hours) + (int(minutes) / 60.0)
+
+# Convert a column of "hh:mm" strings to minutes; blank or unparseable values are NaN so sums skip them
+def time_column_minutes(values):
+    parts = values.astype(str).str.extract(r'^\s*([+-]?[0-9]+)\s*:\s*([+-]?[0-9]+)\s*$')
+    return pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce')
+
+def format_decimal_hours(value):
+    """Format decimal hours with up to 2 decimals and no trailing zeros (2.50 -> "2.5", 3.00 -> "3")"""
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+# OT data cells show "0.0" for no overtime, otherwise the decimal hours ("02:30" -> "2.5")
+def format_ot_hours(hours):
+    return '0.0' if hours == 0 else format_decimal_hours(hours)
+
+# TOTAL row values that do not depend on the data
+constant_totals = {'Penalty': '0.0', 'Allowence': '0.0', 'H': '', 'MC': '', 'AL': '', 'UP': '', 'S': ''}
+
+# Save Excel file under a unique name in the current directory
+fd, filename = tempfile.mkstemp(prefix="employee_attendance_grouped_", suffix=".xlsx", dir=".")
+os.close(fd)
+
+# Create workbook; constant_memory flushes each row to disk once the next row is started
+wb = xlsxwriter.Workbook(filename, {'constant_memory': True, 'strings_to_numbers': False, 'strings_to_urls': False})
+ws = wb.add_worksheet("Attendance")
 
 # Create Tahoma font
-tahoma_font = Font(name='Tahoma', size=10)
-tahoma_bold_font = Font(name='Tahoma', size=10, bold=True)
+tahoma_font = {'font_name': 'Tahoma', 'font_size': 10}
+tahoma_bold_font = {'font_name': 'Tahoma', 'font_size': 10, 'bold': True}
 
 # Create yellow fill for Sunday rows
-yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+yellow_fill = '#FFFF00'
 
 # Create light red fill for late clock-in cells
-red_fill = PatternFill(start_color='FFCCCB', end_color='FFCCCB', fill_type='solid')
+red_fill = '#FFCCCB'
 
 # Create light purple fill for penalty cells
-light_purple_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
+light_purple_fill = '#E6E6FA'
 
 # Create light orange fill for total base cells
-light_orange_fill = PatternFill(start_color='FFE4B5', end_color='FFE4B5', fill_type='solid')
+light_orange_fill = '#FFE4B5'
 
 # Create bright red font for suspicious early clock in
-bright_red_font = Font(name='Tahoma', size=10, color='FF0000')
+bright_red_font = {'font_name': 'Tahoma', 'font_size': 10, 'font_color': '#FF0000'}
 
 # Create orange fill for suspicious punch pattern rows
-orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
+orange_fill = '#FFA500'
 
 # Create green fill for total rows
-green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
+green_fill = '#90EE90'
 
 # Create light yellow fill for specific header columns
-header_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
+header_fill = '#FFF2CC'
 
 # Create light orange fill for Total Base column
-total_base_fill = PatternFill(start_color='FFCC99', end_color='FFCC99', fill_type='solid')
+total_base_fill = '#FFCC99'
 
 # Create light green fill for Total Day column
-total_day_fill = PatternFill(start_color='E2EFDA', end_color='E2EFDA', fill_type='solid')
+total_day_fill = '#E2EFDA'
 
 # Create light orange fill for Clock columns
-clock_header_fill = PatternFill(start_color='FFE4B5', end_color='FFE4B5', fill_type='solid')
+clock_header_fill = '#FFE4B5'
 
 # Create light blue fill for OT columns
-ot_header_fill = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')
+ot_header_fill = '#ADD8E6'
 
 # Create light purple fill for Penalty column
-penalty_fill = PatternFill(start_color='E6E6FA', end_color='E6E6FA', fill_type='solid')
+penalty_fill = '#E6E6FA'
 
 # Create title font
-title_font = Font(name='Tahoma', size=22, bold=True)
+title_font = {'font_name': 'Tahoma', 'font_size': 22, 'bold': True}
 
 # Create subtitle font
-subtitle_font = Font(name='Tahoma', size=14, bold=True)
+subtitle_font = {'font_name': 'Tahoma', 'font_size': 14, 'bold': True}
+
+def cell_format(font=None, fill=None, wrap=False, border=True):
+    """Add a cell format with the given font, solid fill, wrap and thin border"""
+    props = dict(font or {})
+    if fill:
+        props.update({'pattern': 1, 'bg_color': fill})
+    if wrap:
+        props['text_wrap'] = True
+    if border:
+        props['border'] = 1  # Thin border on all sides
+    return wb.add_format(props)
+
+# Register one format per data/total cell look (font + fill + border), so each cell is written with a single lookup
+styles = {}
+data_fills = {'plain': None, 'orange': orange_fill, 'red': red_fill, 'yellow': yellow_fill, 'penalty': penalty_fill, 'total_base': total_base_fill, 'total_day': total_day_fill}
+for fill_name, fill in data_fills.items():
+    styles[f'data_{fill_name}'] = cell_format(tahoma_font, fill)
+    styles[f'data_red_font_{fill_name}'] = cell_format(bright_red_font, fill)
+styles['total_label'] = cell_format(tahoma_bold_font, green_fill)
+styles['total'] = cell_format(tahoma_font, green_fill)
+# Header and employee info cells get their own formats too
+header_fills = {'plain': None, 'colored': header_fill, 'total_base': total_base_fill, 'total_day': total_day_fill, 'clock': clock_header_fill, 'ot': ot_header_fill, 'penalty': penalty_fill}
+for fill_name, fill in header_fills.items():
+    styles[f'header_{fill_name}'] = cell_format(tahoma_bold_font, fill, wrap=True)
+styles['info_label'] = cell_format(tahoma_bold_font)
+styles['info_value'] = cell_format(tahoma_font)
+styles['blank'] = cell_format()
+styles['title'] = cell_format(title_font, border=False)
+styles['subtitle'] = cell_format(subtitle_font, border=False)
+
+def write_cells(row_num, cells):
+    """Write a row of (value, style name) pairs starting at column A; row_num is 1-based"""
+    for col_num, (value, style) in enumerate(cells):
+        ws.write(row_num - 1, col_num, value, styles[style])
+
+# Freeze panes to keep header rows visible when scrolling
+# Freeze at the row right after the column headers (row 6)
+ws.freeze_panes(5, 0)
 
 current_row = 1
 
 # Add company name title at the top
-ws.cell(row=current_row, column=1, value=company_name).font = title_font
+write_cells(current_row, [(company_name, 'title')])
 current_row += 2  # Add 1 empty row of space after title
 
 # Add subtitle
-ws.cell(row=current_row, column=1, value="Monthly Statement Report").font = subtitle_font
+write_cells(current_row, [("Monthly Statement Report", 'subtitle')])
 current_row += 2  # Add 1 empty row of space after subtitle
 
 # Write column headers only once
 cols_to_show = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent', 'Penalty', 'OT1', 'OT2', 'OT3', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day']
 # Define columns that need the special header color
 colored_header_columns = ['Date', 'Workday', 'Timetable', 'EYEE NAME', 'StartWorkTime', 'EndWorkTime', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Required Work Time', 'Break', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Work Time', 'Absent']
+header_cells = []
 for col_idx, col_name in enumerate(cols_to_show, start=1):
-    header_cell = ws.cell(row=current_row, column=col_idx, value=col_name)
-    header_cell.font = tahoma_bold_font
-    header_cell.alignment = Alignment(wrap_text=True)
     # Apply background color to specific columns
     if col_name in colored_header_columns:
-        header_cell.fill = header_fill
+        header_style = 'header_colored'
     elif col_name == 'Total Base':
-        header_cell.fill = total_base_fill
+        header_style = 'header_total_base'
     elif col_name in ['Total Day', 'Night Shift', 'Allowence']:
-        header_cell.fill = total_day_fill
+        header_style = 'header_total_day'
     elif col_name in ['Clock-In', 'Clock-Out', 'In', 'Out']:
-        header_cell.fill = clock_header_fill
+        header_style = 'header_clock'
     elif col_name in ['OT1', 'OT2', 'OT3']:
-        header_cell.fill = ot_header_fill
+        header_style = 'header_ot'
     elif col_name == 'Penalty':
-        header_cell.fill = penalty_fill
-ws.row_dimensions[current_row].height = 39.75
+        header_style = 'header_penalty'
+    else:
+        header_style = 'header_plain'
+    header_cells.append((col_name, header_style))
+ws.set_row(current_row - 1, 39.75)
+write_cells(current_row, header_cells)
 current_row += 1
 
-for emp_id, group in df.groupby('employee_id'):
+# Blank bordered cells for the spacer row between employees and the rest of the info row
+blank_cells = [(None, 'blank')] * len(cols_to_show)
+
+# Sunday and NIGHT-timetable flags computed once for the whole report, reused by every employee's rows and TOTAL
+df['is_sunday'] = df['Workday'] == 'Sun.'
+df['is_night_shift'] = df['Timetable'].astype(str).str.upper().str.contains('NIGHT', regex=False)
+
+# hh:mm columns parsed once for the whole report: minutes for the time totals and the suspicious check, decimal hours for OT
+time_total_columns = ['Required Work Time', 'Work Time', 'Absent', 'Late Clock In', 'Early Clock In', 'Early Clock Out']
+for col in time_total_columns:
+    df[f'{col} minutes'] = time_column_minutes(df[col])
+for col in ['OT1', 'OT2', 'OT3']:
+    df[f'{col} hours'] = df[col].map(time_to_decimal_total)
+
+# Format time columns from HH:MM:SS to HH:MM once for the whole report instead of per cell
+for col in ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']:
+    times = df[col].astype(object)
+    parts = times.str.split(':')
+    df[col] = times.where(times.str.count(':') != 2, parts.str[0] + ':' + parts.str[1])
+
+# Per-column styling decided once: fill rule, red font on suspicious rows, late/early highlight
+fill_rules = {'Penalty': 'penalty', 'Total Base': 'total_base', 'Total Day': 'total_day', 'Night Shift': 'total_day', 'Allowence': 'total_day'}
+col_kind = [(fill_rules.get(col_name),
+             col_name in ['Timetable', 'StartWorkTime', 'EndWorkTime', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Night Shift'],
+             col_name in ['Late Clock In', 'Early Clock Out'])
+            for col_name in cols_to_show]
+
+for emp_index, (emp_id, group) in enumerate(df.groupby('employee_id')):
     emp_info = group.iloc[0]
 
+    # Empty row left after the previous employee
+    if emp_index > 0:
+        write_cells(current_row - 1, blank_cells)
+
     # Write employee info in single row format
-    ws.cell(row=current_row, column=1, value="Employee ID").font = tahoma_bold_font
-    ws.cell(row=current_row, column=2, value=emp_id).font = tahoma_font
-    ws.cell(row=current_row, column=3, value="Full Name").font = tahoma_bold_font
-    ws.cell(row=current_row, column=4, value=emp_info['full_name']).font = tahoma_font
-    ws.row_dimensions[current_row].height = 18
+    ws.set_row(current_row - 1, 18)
+    write_cells(current_row, [
+        ("Employee ID", 'info_label'),
+        (emp_id, 'info_value'),
+        ("Full Name", 'info_label'),
+        (emp_info['full_name'], 'info_value'),
+    ] + blank_cells[4:])
     current_row += 1
 
-    # Function to format time from HH:MM:SS to HH:MM
-    def format_time(time_str):
-        if not time_str or time_str == '':
-            return time_str
-        try:
-            # If time has seconds, remove them
-            if time_str.count(':') == 2:
-                parts = time_str.split(':')
-                return f"{parts[0]}:{parts[1]}"
-            else:
-                return time_str
-        except:
-            return time_str
-
     # Write data rows
-    data_start_row = current_row  # Mark the start of data rows for grouping
-    for _, row in group.iterrows():
-        is_sunday = row.get('Workday') == 'Sun.'
+    # Plain dict rows keep row.get() lookups without building a Series per row
+    for row in group.to_dict('records'):
+        is_sunday = row['is_sunday']
         
-        # Function to convert time string to minutes for comparison
-        def time_to_minutes(time_str):
-            if not time_str or time_str in ['', '0:00', '00:00']:
-                return 0
-            try:
-                parts = time_str.split(':')
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                return hours * 60 + minutes
-            except:
-                return 0
+        # Suspicious-row flags come precomputed from the query
+        is_suspicious_row = bool(row['is_suspicious_early'])  # Early Clock In > 2:30
+        is_punch_suspicious = bool(row['is_suspicious_punch'])  # Only Clock In, or Clock In + Clock Out + In missing Out
         
-        # Check if this is a suspicious row (Early Clock In > 2:30)
-        early_in_value = row.get('Early Clock In', "")
-        early_in_minutes = time_to_minutes(early_in_value)
-        is_suspicious_row = early_in_minutes > 150  # 2:30 = 150 minutes
-        
-        # Check for suspicious punch patterns
-        def has_value(val):
-            return val and val.strip() != ''
-        
-        clock_in = row.get('Clock-In', '')
-        clock_out = row.get('Clock-Out', '')
-        in_punch = row.get('In', '')
-        out_punch = row.get('Out', '')
-        
-        clock_in_exists = has_value(clock_in)
-        clock_out_exists = has_value(clock_out)
-        in_exists = has_value(in_punch)
-        out_exists = has_value(out_punch)
-        
-        # Determine if punch pattern is suspicious
-        is_punch_suspicious = False
-        if clock_in_exists and not clock_out_exists and not in_exists and not out_exists:
-            # Only Clock In exists = SUSPICIOUS
-            is_punch_suspicious = True
-        elif clock_in_exists and clock_out_exists and in_exists and not out_exists:
-            # Clock In + Clock Out + In (missing Out) = SUSPICIOUS
-            is_punch_suspicious = True
-        
-        for col_idx, col_name in enumerate(cols_to_show, start=1):
+        row_cells = []
+        for col_idx, (col_name, (fill_rule, suspicious_col, late_early_col)) in enumerate(zip(cols_to_show, col_kind), start=1):
             # Set value based on column name
             if col_name == 'EYEE NAME':
                 cell_value = emp_info['full_name']
             elif col_name == 'Timetable':
                 # Format as "Timetable (StartTime - EndTime)"
                 timetable_name = row.get('Timetable', "")
-                start_time = format_time(row.get('StartWorkTime', ""))
-                end_time = format_time(row.get('EndWorkTime', ""))
+                start_time = row.get('StartWorkTime', "")
+                end_time = row.get('EndWorkTime', "")
                 if timetable_name and start_time and end_time:
                     cell_value = f"{timetable_name} ({start_time} - {end_time})"
                 else:
@@ -411,8 +486,7 @@ for emp_id, group in df.groupby('employee_id'):
                 cell_value = '0.0'
             elif col_name == 'Night Shift':
                 # Check if original Timetable contains "NIGHT"
-                original_timetable = row.get('Timetable', "")
-                if 'NIGHT' in str(original_timetable).upper():
+                if row['is_night_shift']:
                     cell_value = '2.0'
                 else:
                     cell_value = '0.0'
@@ -442,217 +516,64 @@ for emp_id, group in df.groupby('employee_id'):
             elif col_name == 'Total Day':
                 # Fill every cell with 1.0
                 cell_value = '1.0'
-            elif col_name in ['StartWorkTime', 'EndWorkTime', 'Clock-In', 'Clock-Out', 'In', 'Out']:
-                # Format time columns to show only HH:MM (remove seconds)
-                cell_value = format_time(row.get(col_name, ""))
             else:
                 cell_value = row.get(col_name, "")
             
-            # Convert OT time values to decimal format
+            # OT cells show the decimal hours precomputed in the "<col> hours" columns
             if col_name in ['OT1', 'OT2', 'OT3'] and cell_value:
-                # Convert "hh:mm" to decimal (e.g., "02:30" -> "2.5")
-                def time_to_decimal(time_str):
-                    if not time_str or time_str in ['', '0:00', '00:00']:
-                        return '0.0'
-                    try:
-                        parts = time_str.split(':')
-                        hours = int(parts[0])
-                        minutes = int(parts[1])
-                        decimal_value = hours + (minutes / 60.0)
-                        return f"{decimal_value:.2f}".rstrip('0').rstrip('.')
-                    except:
-                        return cell_value
-                
-                cell_value = time_to_decimal(cell_value)
-            
-            cell = ws.cell(row=current_row, column=col_idx, value=cell_value)
+                cell_value = format_ot_hours(row[f'{col_name} hours'])
             
             # Apply font styling based on suspicious row detection
-            if is_suspicious_row and col_name in ['Timetable', 'StartWorkTime', 'EndWorkTime', 'Late Clock In', 'Early Clock In', 'Early Clock Out', 'Night Shift']:
-                cell.font = bright_red_font  # Apply bright red font for suspicious rows
-            else:
-                cell.font = tahoma_font  # Apply regular font to data cells
+            style_prefix = 'data_red_font_' if is_suspicious_row and suspicious_col else 'data_'
             
             # Apply cell coloring based on conditions (punch suspicious takes priority)
+            late_early_value = row.get(col_name, "") if late_early_col else ""
             if is_punch_suspicious:
                 # Apply orange background to entire row for suspicious punch patterns
-                cell.fill = orange_fill
-            elif col_name == 'Late Clock In':
-                # Check if this is a late clock-in cell with a value other than 0:00
-                late_value = row.get(col_name, "")
-                if late_value and late_value not in ['0:00', '00:00', '']:
-                    cell.fill = red_fill
-                elif is_sunday:
-                    cell.fill = yellow_fill
-            elif col_name == 'Early Clock In':
-                # Apply Sunday background if applicable
-                if is_sunday:
-                    cell.fill = yellow_fill
-            elif col_name == 'Early Clock Out':
-                # Check if this is an early clock-out cell with a value other than 0:00
-                early_out_value = row.get(col_name, "")
-                if early_out_value and early_out_value not in ['0:00', '00:00', '']:
-                    cell.fill = red_fill  # Light red even on Sunday
-                elif is_sunday:
-                    cell.fill = yellow_fill
-            elif col_name == 'Penalty':
-                # Check if this is a penalty cell
-                if is_sunday:
-                    cell.fill = yellow_fill
-                elif cell_value and cell_value != '':
-                    # Apply light pink color to all non-empty, non-Sunday cells
-                    cell.fill = penalty_fill
-            elif col_name == 'Total Base':
-                # Check if this is a total base cell
-                if is_sunday:
-                    cell.fill = yellow_fill
-                elif cell_value and cell_value != '':
-                    # Apply new orange color to all non-empty, non-Sunday cells
-                    cell.fill = total_base_fill
-            elif col_name == 'Total Day':
-                # Check if this is a total day cell
-                if is_sunday:
-                    cell.fill = yellow_fill
-                elif cell_value and cell_value != '':
-                    # Apply light green color to all non-empty, non-Sunday cells
-                    cell.fill = total_day_fill
-            elif col_name in ['Night Shift', 'Allowence']:
-                # Check if this is a night shift or allowence cell
-                if is_sunday:
-                    cell.fill = yellow_fill
-                elif cell_value and cell_value != '':
-                    # Apply light green color to all non-empty, non-Sunday cells
-                    cell.fill = total_day_fill
+                fill_name = 'orange'
+            elif late_early_value and late_early_value not in ['0:00', '00:00', '']:
+                # Late clock-in / early clock-out with a value other than 0:00 is light red even on Sunday
+                fill_name = 'red'
             elif is_sunday:
-                cell.fill = yellow_fill
-        ws.row_dimensions[current_row].height = 18
-        # Set outline level for data rows (level 1 for grouping)
-        ws.row_dimensions[current_row].outline_level = 1
+                fill_name = 'yellow'
+            elif fill_rule and cell_value:
+                # Penalty, Total Base, Total Day, Night Shift and Allowence columns get their own color
+                fill_name = fill_rule
+            else:
+                fill_name = 'plain'
+            row_cells.append((cell_value, style_prefix + fill_name))
+        # Set outline level for data rows (level 1 for grouping), hidden by default to show collapsed view
+        ws.set_row(current_row - 1, 18, None, {'level': 1, 'hidden': True})
+        write_cells(current_row, row_cells)
         current_row += 1
 
+    # Every TOTAL value for this employee, computed before the row is written; other columns stay empty
+    totals = dict(constant_totals)
+    # Night shift rows count 2.0 each
+    totals['Night Shift'] = f"{2.0 * group['is_night_shift'].sum():.1f}"
+    # Total Base counts 1.0 for each non-Sunday row
+    totals['Total Base'] = f"{float((~group['is_sunday']).sum()):.1f}"
+    # Day counts 1.0 for each non-Sunday row where the worker was present (has clock-in OR clock-out)
+    present = group['Clock-In'].astype(bool) | group['Clock-Out'].astype(bool)
+    totals['Day'] = f"{float((~group['is_sunday'] & present).sum()):.1f}"
+    # Total Day counts 1.0 for every row
+    totals['Total Day'] = f"{len(group):.1f}"
+    # OT columns sum the decimal hours parsed up front
+    for col in ['OT1', 'OT2', 'OT3']:
+        totals[col] = format_decimal_hours(sum(group[f'{col} hours'].tolist(), 0.0))
+    # Time columns sum the minutes parsed up front; cells without hh:mm count as 0
+    for col in time_total_columns:
+        total_minutes = int(group[f'{col} minutes'].sum())
+        totals[col] = f"{total_minutes // 60}:{total_minutes % 60:02}"
+
     # Write total row
-    total_cell = ws.cell(row=current_row, column=1, value="TOTAL")
-    total_cell.font = tahoma_bold_font
-    total_cell.fill = green_fill
-    for col_idx, col_name in enumerate(cols_to_show, start=1):
-        if col_name in sum_columns:
-            if col_name in ['Penalty', 'Night Shift', 'Allowence', 'Total Base', 'Day', 'H', 'MC', 'AL', 'UP', 'S', 'Total Day', 'OT1', 'OT2', 'OT3']:
-                # For decimal columns, sum the decimal values
-                if col_name == 'Penalty':
-                    # For Penalty column, since all values are 0.0, total is 0.0
-                    penalty_cell = ws.cell(row=current_row, column=col_idx, value="0.0")
-                    penalty_cell.font = tahoma_font
-                    penalty_cell.fill = green_fill
-                elif col_name == 'Night Shift':
-                    # Sum the night shift values (0.0 or 2.0)
-                    total_night_shift = 0.0
-                    for _, data_row in group.iterrows():
-                        original_timetable = data_row.get('Timetable', "")
-                        if 'NIGHT' in str(original_timetable).upper():
-                            total_night_shift += 2.0
-                    night_shift_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_night_shift:.1f}")
-                    night_shift_cell.font = tahoma_font
-                    night_shift_cell.fill = green_fill
-                elif col_name == 'Allowence':
-                    # For Allowence column, since all values are 0.0, total is 0.0
-                    allowence_cell = ws.cell(row=current_row, column=col_idx, value="0.0")
-                    allowence_cell.font = tahoma_font
-                    allowence_cell.fill = green_fill
-                elif col_name == 'Total Base':
-                    # For Total Base column, sum 1.0 for non-Sunday and 0.0 for Sunday
-                    total_base = 0.0
-                    for _, data_row in group.iterrows():
-                        workday_value = data_row.get('Workday', "")
-                        if workday_value != 'Sun.':
-                            total_base += 1.0
-                        # Sunday rows contribute 0.0 (no need to add)
-                    total_base_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_base:.1f}")
-                    total_base_cell.font = tahoma_font
-                    total_base_cell.fill = green_fill
-                elif col_name == 'Day':
-                    # For Day column, sum 1.0 for non-Sunday days where worker was present
-                    total_days = 0.0
-                    for _, data_row in group.iterrows():
-                        workday_value = data_row.get('Workday', "")
-                        if workday_value != 'Sun.':  # Not Sunday
-                            # Check if worker was present (has clock-in OR clock-out)
-                            clock_in = data_row.get('Clock-In', '')
-                            clock_out = data_row.get('Clock-Out', '')
-                            if clock_in or clock_out:  # If either clock-in or clock-out has value
-                                total_days += 1.0
-                        # Sunday rows contribute 0.0 (no need to add)
-                    day_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_days:.1f}")
-                    day_cell.font = tahoma_font
-                    day_cell.fill = green_fill
-                elif col_name in ['H', 'MC', 'AL', 'UP', 'S']:
-                    # For these columns, since all values are empty, total is empty
-                    empty_cell = ws.cell(row=current_row, column=col_idx, value="")
-                    empty_cell.font = tahoma_font
-                    empty_cell.fill = green_fill
-                elif col_name == 'Total Day':
-                    # For Total Day column, sum all 1.0 values
-                    total_day_count = len(group)  # Count all rows (each has 1.0)
-                    total_day_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_day_count:.1f}")
-                    total_day_cell.font = tahoma_font
-                    total_day_cell.fill = green_fill
-                elif col_name in ['OT1', 'OT2', 'OT3']:
-                    # For OT columns, sum the decimal values (converted from time)
-                    total_ot = 0.0
-                    for _, data_row in group.iterrows():
-                        ot_value = data_row.get(col_name, "")
-                        if ot_value and ot_value not in ['', '0:00', '00:00']:
-                            # Convert time to decimal for summing
-                            try:
-                                parts = ot_value.split(':')
-                                hours = int(parts[0])
-                                minutes = int(parts[1])
-                                decimal_value = hours + (minutes / 60.0)
-                                total_ot += decimal_value
-                            except:
-                                pass
-                    ot_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_ot:.2f}".rstrip('0').rstrip('.'))
-                    ot_cell.font = tahoma_font
-                    ot_cell.fill = green_fill
-            else:
-                # Convert "hh:mm" to minutes for summing
-                def time_to_minutes(t):
-                    h, m = map(int, t.split(":"))
-                    return h * 60 + m
-
-                total_minutes = sum(time_to_minutes(v) for v in group[col_name] if isinstance(v, str) and ":" in v)
-                total_h = total_minutes // 60
-                total_m = total_minutes % 60
-                time_cell = ws.cell(row=current_row, column=col_idx, value=f"{total_h}:{total_m:02}")
-                time_cell.font = tahoma_font
-                time_cell.fill = green_fill
-        elif col_idx > 1:  # Don't override the TOTAL label in column 1
-            # Apply regular font to empty cells in total row (except column 1)
-            empty_total_cell = ws.cell(row=current_row, column=col_idx, value="")
-            empty_total_cell.font = tahoma_font
-            empty_total_cell.fill = green_fill
-    ws.row_dimensions[current_row].height = 18
+    total_cells = [("TOTAL", 'total_label')] + [(totals.get(col_name, ""), 'total') for col_name in cols_to_show[1:]]
+    ws.set_row(current_row - 1, 18)
+    write_cells(current_row, total_cells)
 
     # Add one empty row after each employee
     current_row += 2
 
-# Apply border to all cells with data (excluding title rows)
-for row in ws.iter_rows(min_row=5, max_row=ws.max_row, min_col=1, max_col=len(cols_to_show)):
-    for cell in row:
-        cell.border = thin_border
 
-# Freeze panes to keep header rows visible when scrolling
-# Freeze at the row right after the column headers (row 6)
-ws.freeze_panes = 'A6'
-
-# Set outline groups to be collapsed by default
-# Hide all data rows (outline level 1) by default to show collapsed view
-for row_num in range(1, ws.max_row + 1):
-    if row_num in ws.row_dimensions:
-        if hasattr(ws.row_dimensions[row_num], 'outline_level') and ws.row_dimensions[row_num].outline_level == 1:
-            ws.row_dimensions[row_num].hidden = True
-
-# Save Excel file with random number
-random_num = random.randint(1000, 9999)
-filename = f"employee_attendance_grouped_{random_num}.xlsx"
-wb.save(filename)
+wb.close()
 print(f"✅ Excel file created: {filename}")
\ No newline at end of file
@@ -0,0 +1,91 @@
+import math
+import numbers
+import re
+from xml.sax.saxutils import escape
+
+# Minimal single-sheet XLSX package shared by main.py and api_main.py - the reports are fixed grids, so the XML is written directly
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Sheet XML opens with the worksheet element; the report adds its own sheet view, <cols> and <sheetData>
+SHEET_HEAD_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+SHEET_TAIL_XML = '</sheetData></worksheet>'
+
+# Building blocks for each report's STYLES_XML
+def solid_fill_xml(rgb):
+    return f'<fill><patternFill patternType="solid"><fgColor rgb="FF{rgb}"/><bgColor rgb="FF{rgb}"/></patternFill></fill>'
+
+def xf_xml(font, fill=0, border=1, wrap=False):
+    xf = f'<xf numFmtId="0" fontId="{font}" fillId="{fill}" borderId="{border}" xfId="0" applyFont="1" applyFill="1" applyBorder="1"'
+    return xf + ' applyAlignment="1"><alignment wrapText="1"/></xf>' if wrap else xf + '/>'
+
+def column_letters(count):
+    """Column letters A, B, ..., Z, AA, AB, ... for the first count columns"""
+    return [chr(65 + i) if i < 26 else chr(64 + i // 26) + chr(65 + i % 26) for i in range(count)]
+
+# Control characters XML 1.0 does not allow, and literal _xHHHH_ text that Excel would read as an escape
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+EXCEL_ESCAPE_TEXT = re.compile(r'_x[0-9a-fA-F]{4}_')
+
+def xml_text(value):
+    """Build the <t> element for a cell string; control characters become _xHHHH_ escapes the way xlsxwriter writes them"""
+    if '_x' in value:
+        value = EXCEL_ESCAPE_TEXT.sub(lambda m: '_x005F' + m.group(0), value)
+    if ILLEGAL_XML_CHARS.search(value):
+        value = ILLEGAL_XML_CHARS.sub(lambda m: f'_x{ord(m.group(0)):04X}_', value)
+    # Keep leading/trailing spaces, e.g. "First " from a NULL last name
+    space = ' xml:space="preserve"' if value != value.strip() else ''
+    return f'<t{space}>{escape(value)}</t>'
+
+def xml_row(letters, row_num, values, styles, height=None, collapsed=False):
+    """Build one <row> of cells; letters are the sheet's column letters, styles is one cellXfs index per cell,
+    collapsed rows are hidden at outline level 1"""
+    r = str(row_num)
+    ht = f' ht="{height}" customHeight="1"' if height is not None else ''
+    if collapsed:
+        ht += ' hidden="1" outlineLevel="1"'
+    cells = [f'<row r="{r}"{ht}>']
+    for col, value, style in zip(letters, values, styles):
+        if value is None or value == '':
+            cells.append(f'<c r="{col}{r}" s="{style}"/>')
+        elif isinstance(value, str):
+            cells.append(f'<c r="{col}{r}" s="{style}" t="inlineStr"><is>{xml_text(value)}</is></c>')
+        elif isinstance(value, numbers.Number) and not isinstance(value, bool):
+            # Numbers are written as numeric cells; NaN and infinity have no cell value
+            number = '' if math.isnan(value) or math.isinf(value) else '%.16g' % value
+            cells.append(f'<c r="{col}{r}" s="{style}" t="n"><v>{number}</v></c>')
+        else:
+            cells.append(f'<c r="{col}{r}" s="{style}" t="inlineStr"><is>{xml_text(str(value))}</is></c>')
+    cells.append('</row>')
+    return ''.join(cells)